@@ -0,0 +1,81 @@
+"""Compare `json.load` with `json_stream` on large registry responses.
+
+    python -m benchmarks.json_stream --versions 5000
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+from collections.abc import Sequence
+from typing import Any
+from typing import IO
+
+from pre_commit_mirror_maker import json_stream
+from testing import fixtures
+
+
+def _pypi_json_load(fp: IO[bytes]) -> list[str]:
+    return list(json.load(fp)['releases'])
+
+
+def _pypi_json_stream(fp: IO[bytes]) -> list[str]:
+    return [k for k, _ in json_stream.object_items(fp, 'releases')]
+
+
+def _crates_json_load(fp: IO[bytes]) -> list[str]:
+    return [v['num'] for v in json.load(fp)['versions']]
+
+
+def _crates_json_stream(fp: IO[bytes]) -> list[str]:
+    return [v['num'] for v in json_stream.array_items(fp, 'versions')]
+
+
+def _measure(
+        func: Callable[[IO[bytes]], Any],
+        body: bytes,
+        repeat: int,
+) -> tuple[float, int]:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(io.BytesIO(body))
+        best = min(best, time.perf_counter() - t0)
+
+    # the response body itself is not counted: it arrives over the network
+    tracemalloc.start()
+    func(io.BytesIO(body))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--versions', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cases = (
+        ('pypi', fixtures.pypi_json, _pypi_json_load, _pypi_json_stream),
+        (
+            'crates', fixtures.crates_json,
+            _crates_json_load, _crates_json_stream,
+        ),
+    )
+    print(f'{"":24}{"time (ms)":>12}{"peak (MiB)":>12}')
+    for name, make_body, *funcs in cases:
+        body = make_body(args.versions)
+        print(f'{name}: {len(body) / 1024 / 1024:.1f} MiB')
+        for func in funcs:
+            t, peak = _measure(func, body, args.repeat)
+            label = func.__name__.rpartition('_json_')[2]
+            print(f'    {label:20}{t * 1000:12.1f}{peak / 1024 / 1024:12.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,316 @@
+"""Benchmark the mirror pipeline against a local stand-in registry.
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline -k bootstrap --save
+
+Each case runs in a fresh interpreter (with an empty cache) so its peak RSS
+is its own.  Wall time, subprocess count and peak RSS are compared against
+the stored baseline; a regression past `--tolerance` (or any extra
+subprocess) fails the run.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os.path
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from collections.abc import Sequence
+from typing import Any
+from typing import NamedTuple
+from unittest import mock
+
+from pre_commit_mirror_maker import languages
+from pre_commit_mirror_maker.make_repo import make_repo
+from testing import fixtures
+from testing.registry import Registry
+from testing.registry import serve
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+PACKAGES = {
+    'golang': 'example.com/pkg',
+    'node': 'pkg',
+    'python': 'pkg',
+    'ruby': 'pkg',
+    'rust': 'pkg',
+}
+METRICS = ('wall', 'subprocesses', 'peak_rss')
+# differences below this are noise for the short cases
+WALL_SLACK = .05
+
+
+class Case(NamedTuple):
+    name: str
+    language: str
+    versions: int
+    # versions already mirrored before the measured run, None: list only
+    mirrored: int | None = None
+    bulk: bool = False
+
+
+def _cases(list_versions: int, sizes: Sequence[int], base: int) -> list[Case]:
+    ret = [
+        Case(f'list {language}', language, list_versions)
+        for language in sorted(PACKAGES)
+    ]
+    for n in sizes:
+        ret.append(Case(f'bootstrap {n}', 'python', n, mirrored=0))
+        ret.append(
+            Case(f'bootstrap {n} --bulk', 'python', n, mirrored=0, bulk=True),
+        )
+    for new in (0, 1):
+        ret.append(Case(f'incremental {new}', 'python', base + new, base))
+    return ret
+
+
+def _serve_versions(registry: Registry, language: str, n: int) -> None:
+    if language == 'golang':
+        registry.add('/go/example.com/pkg/@v/list', fixtures.goproxy_list(n))
+    elif language == 'node':
+        registry.add('/npm/pkg', fixtures.npm_json(n))
+    elif language == 'python':
+        registry.add('/simple/pkg/', fixtures.simple_json(n))
+    elif language == 'ruby':
+        registry.add('/api/v1/versions/pkg.json', fixtures.rubygems_json(n))
+    elif language == 'rust':
+        registry.add('/api/v1/crates/pkg', fixtures.crates_json(n))
+    else:
+        raise AssertionError(f'unreachable: {language}')
+
+
+def _env(registry: Registry, tmp: str) -> dict[str, str]:
+    env = dict(os.environ)
+    env.pop('PRE_COMMIT_MIRROR_MAKER_CACHE_TTL', None)
+    env.update(
+        BENCHMARK_REGISTRY=registry.url,
+        GOPROXY=f'{registry.url}/go',
+        PIP_INDEX_URL=f'{registry.url}/simple',
+        npm_config_registry=f'{registry.url}/npm/',
+        npm_config_userconfig=os.devnull,
+        PRE_COMMIT_MIRROR_MAKER_CACHE_DIR=tempfile.mkdtemp(dir=tmp),
+        # the user's git config (hooks, signing) is not what's measured
+        GIT_CONFIG_GLOBAL=os.devnull,
+        GIT_CONFIG_NOSYSTEM='1',
+        # nor is a background `git gc`
+        GIT_CONFIG_COUNT='1',
+        GIT_CONFIG_KEY_0='gc.auto',
+        GIT_CONFIG_VALUE_0='0',
+        GIT_AUTHOR_NAME='benchmark',
+        GIT_AUTHOR_EMAIL='benchmark@example.com',
+        GIT_COMMITTER_NAME='benchmark',
+        GIT_COMMITTER_EMAIL='benchmark@example.com',
+    )
+    return env
+
+
+def _run_child(case: Case, env: dict[str, str], repo: str) -> dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        cmd: tuple[str, ...] = (
+            sys.executable, '-m', 'benchmarks.pipeline',
+            '--child', case.language, PACKAGES[case.language],
+            '--output', output.name,
+        )
+        if case.mirrored is not None:
+            cmd += ('--repo', repo)
+        if case.bulk:
+            cmd += ('--bulk',)
+        # `git commit` is chatty
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, check=True)
+        return json.load(output)
+
+
+def _peak_rss() -> int:
+    # linux keeps `ru_maxrss` across fork + exec, which would report the
+    # parent (holding all of the registry responses) instead
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss
+    else:
+        return peak_rss * 1024  # kibibytes everywhere else
+
+
+def _child(args: argparse.Namespace) -> int:
+    language, package_name = args.child
+    registry = os.environ['BENCHMARK_REGISTRY']
+
+    func: Callable[[], object]
+    if args.repo is None:
+        def func() -> object:
+            return languages.LIST_VERSIONS[language](package_name)
+    else:
+        def func() -> object:
+            make_repo(
+                args.repo,
+                language=language, name=package_name, bulk=args.bulk,
+                description='', entry=package_name, id=package_name,
+                match_key='types', match_val='python', args='[]',
+                require_serial='false', minimum_pre_commit_version='0',
+            )
+            return None
+
+    subprocesses = 0
+    popen_init = subprocess.Popen.__init__
+
+    def _init(self: Any, *args: Any, **kwargs: Any) -> None:
+        nonlocal subprocesses
+        subprocesses += 1
+        popen_init(self, *args, **kwargs)
+
+    with (
+            mock.patch.object(languages, 'RUBYGEMS', registry),
+            mock.patch.object(languages, 'CRATES_IO', registry),
+            mock.patch.object(subprocess.Popen, '__init__', _init),
+    ):
+        t0 = time.perf_counter()
+        func()
+        wall = time.perf_counter() - t0
+
+    with open(args.output, 'w') as f:
+        json.dump(
+            {
+                'wall': wall,
+                'subprocesses': subprocesses,
+                'peak_rss': _peak_rss(),
+            },
+            f,
+        )
+    return 0
+
+
+def _git_init(path: str) -> None:
+    subprocess.check_call(('git', 'init', '--quiet', path))
+
+
+def _measure(
+        registry: Registry,
+        case: Case,
+        tmp: str,
+        bases: dict[int, str],
+) -> dict[str, Any]:
+    repo = tempfile.mkdtemp(dir=tmp)
+    if case.mirrored is None:
+        pass
+    elif case.mirrored:
+        if case.mirrored not in bases:
+            bases[case.mirrored] = tempfile.mkdtemp(dir=tmp)
+            _git_init(bases[case.mirrored])
+            _serve_versions(registry, case.language, case.mirrored)
+            base_case = case._replace(bulk=True)
+            _run_child(base_case, _env(registry, tmp), bases[case.mirrored])
+        shutil.copytree(bases[case.mirrored], repo, dirs_exist_ok=True)
+    else:
+        _git_init(repo)
+
+    _serve_versions(registry, case.language, case.versions)
+    return _run_child(case, _env(registry, tmp), repo)
+
+
+def _format(metric: str, value: float) -> str:
+    if metric == 'wall':
+        return f'{value:.3f}s'
+    elif metric == 'peak_rss':
+        return f'{value / 1024 / 1024:.1f}MiB'
+    else:
+        return f'{value}'
+
+
+def _regressed(
+        metric: str,
+        value: float,
+        baseline: float,
+        tolerance: float,
+) -> bool:
+    if metric == 'subprocesses':
+        return value > baseline
+    elif metric == 'wall':
+        return value > max(baseline * (1 + tolerance), baseline + WALL_SLACK)
+    else:
+        return value > baseline * (1 + tolerance)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-k', dest='pattern', default='',
+        help='Only run cases whose name contains this.',
+    )
+    parser.add_argument('--versions', type=int, default=5000)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+        help='Number of versions to bootstrap a mirror with.',
+    )
+    parser.add_argument(
+        '--base', type=int, default=1000,
+        help='Number of versions mirrored before an incremental run.',
+    )
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--save', action='store_true',
+        help='Record the results as the new baseline.',
+    )
+    parser.add_argument('--tolerance', type=float, default=.25)
+    # used for running a single case in a separate process
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--repo', help=argparse.SUPPRESS)
+    parser.add_argument('--bulk', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _child(args)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        baseline = {}
+
+    cases = [
+        case for case in _cases(args.versions, args.sizes, args.base)
+        if args.pattern in case.name
+    ]
+    results = {}
+    ret = 0
+    print(f'{"":28}' + ''.join(f'{metric:>24}' for metric in METRICS))
+    with tempfile.TemporaryDirectory() as tmp, serve() as registry:
+        bases: dict[int, str] = {}
+        for case in cases:
+            result = results[case.name] = _measure(registry, case, tmp, bases)
+            line = f'{case.name:28}'
+            for metric in METRICS:
+                s = _format(metric, result[metric])
+                if case.name in baseline:
+                    before = baseline[case.name][metric]
+                    if before:
+                        s += f' ({result[metric] / before - 1:+6.0%})'
+                    tolerance = args.tolerance
+                    if _regressed(metric, result[metric], before, tolerance):
+                        s += '!'
+                        ret = 1
+                line += f'{s:>24}'
+            print(line, flush=True)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return ret
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import os.path
+import time
+import traceback
+from collections.abc import Sequence
+from typing import Any
+from typing import NamedTuple
+
+from pre_commit_mirror_maker.languages import LIST_VERSIONS
+from pre_commit_mirror_maker.main import make_parser
+from pre_commit_mirror_maker.main import make_repo_kwargs
+from pre_commit_mirror_maker.make_repo import format_timings
+from pre_commit_mirror_maker.make_repo import make_repo
+
+
+class Mirror(NamedTuple):
+    repo_path: str
+    kwargs: dict[str, Any]
+
+    @property
+    def package(self) -> tuple[str, str, bool]:
+        """What to list: `(language, name, include yanked versions)`."""
+        yanked = not self.kwargs['version_filter'].skip_yanked
+        return self.kwargs['language'], self.kwargs['name'], yanked
+
+
+def load_manifest(filename: str) -> list[dict[str, Any]]:
+    """Load the list of mirrors from a json or yaml manifest:
+
+    mirrors:
+    -   repo_path: mirrors-yapf
+        language: python
+        package_name: yapf
+        types: python
+        args: -i
+    """
+    with open(filename) as f:
+        if filename.endswith('.json'):
+            contents = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit(
+                    f'{filename}: yaml manifests require pyyaml, install '
+                    f'`pre-commit-mirror-maker[yaml]` or use json',
+                )
+            contents = yaml.safe_load(f)
+    return contents['mirrors']
+
+
+def _flags(options: dict[str, Any]) -> list[str]:
+    argv = []
+    for key, value in options.items():
+        flag = f'--{key.replace("_", "-")}'
+        if value is True:
+            argv.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, list):
+            argv.extend(f'{flag}={v}' for v in value)
+        else:
+            argv.append(f'{flag}={value}')
+    return argv
+
+
+def mirror_argv(mirror: dict[str, Any]) -> list[str]:
+    """Translate a manifest entry into `pre-commit-mirror` arguments.
+
+    Keys are the command line flags (`package_name` / `package-name`),
+    `true` enables a switch and lists repeat the flag (`types_or`).  Each
+    of `hooks` (a list of the same hook options) becomes a `--hook`.
+    """
+    mirror = dict(mirror)
+    argv = [str(mirror.pop('repo_path'))]
+    hooks = mirror.pop('hooks', ())
+    argv.extend(_flags(mirror))
+    for hook in hooks:
+        argv.append('--hook')
+        argv.extend(_flags(hook))
+    return argv
+
+
+def _parse_mirror(mirror: dict[str, Any], root: str) -> Mirror:
+    args = make_parser().parse_args(mirror_argv(mirror))
+    repo_path = os.path.join(root, args.repo_path)
+    return Mirror(repo_path, make_repo_kwargs(args))
+
+
+def _error(e: BaseException) -> str:
+    if isinstance(e, SystemExit):
+        return f'invalid mirror: {e.code}'
+    else:
+        return ''.join(traceback.format_exception_only(type(e), e)).strip()
+
+
+def _list_versions(
+        package: tuple[str, str, bool],
+) -> tuple[list[str], float]:
+    language, name, yanked = package
+    t0 = time.monotonic()
+    ret = LIST_VERSIONS[language](name, yanked=yanked)
+    return ret, time.monotonic() - t0
+
+
+def _update_repo(
+        mirrors: list[Mirror],
+        versions: dict[tuple[str, str, bool], tuple[list[str], float]],
+        results: dict[str, str | None],
+        timings: dict[str, dict[str, float]],
+) -> None:
+    # mirrors sharing a repository must not run git concurrently
+    for mirror in mirrors:
+        package_versions, list_time = versions[mirror.package]
+        mirror_timings = timings[mirror.repo_path] = {'list': list_time}
+        try:
+            make_repo(
+                mirror.repo_path,
+                package_versions=package_versions,
+                timings=mirror_timings,
+                **mirror.kwargs,
+            )
+        except Exception as e:
+            results[mirror.repo_path] = _error(e)
+        else:
+            results[mirror.repo_path] = None
+
+
+def run(
+        manifest: list[dict[str, Any]], *,
+        root: str = '.',
+        jobs: int = 8,
+        git_jobs: int | None = None,
+        timings: dict[str, dict[str, float]] | None = None,
+) -> dict[str, str | None]:
+    """Update every mirror in `manifest`.
+
+    Returns a mapping of repo path to `None` on success or an error message
+    on failure.  A failing mirror does not stop the others.  Per phase
+    timings of each mirror are recorded in `timings` when given.
+    """
+    results: dict[str, str | None] = {}
+    if timings is None:
+        timings = {}
+
+    mirrors = []
+    for i, entry in enumerate(manifest):
+        try:
+            mirrors.append(_parse_mirror(entry, root))
+        except (Exception, SystemExit) as e:
+            label = os.path.join(root, str(entry.get('repo_path', f'#{i}')))
+            results[label] = _error(e)
+
+    # the same package may be mirrored several times, only list it once
+    packages = {mirror.package for mirror in mirrors}
+    versions = {}
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        futures = {
+            package: executor.submit(_list_versions, package)
+            for package in packages
+        }
+        for package, future in futures.items():
+            try:
+                versions[package] = future.result()
+            except Exception as e:
+                error = f'listing versions failed: {_error(e)}'
+                for mirror in mirrors:
+                    if mirror.package == package:
+                        results[mirror.repo_path] = error
+
+    by_repo: dict[str, list[Mirror]] = {}
+    for mirror in mirrors:
+        if mirror.package in versions:
+            key = os.path.realpath(mirror.repo_path)
+            by_repo.setdefault(key, []).append(mirror)
+
+    # git does the heavy lifting in subprocesses so threads spread the work
+    # across cores
+    git_jobs = git_jobs or os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(git_jobs) as executor:
+        for repo_mirrors in by_repo.values():
+            executor.submit(
+                _update_repo, repo_mirrors, versions, results, timings,
+            )
+
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Update every mirror listed in a manifest.',
+    )
+    parser.add_argument(
+        'manifest',
+        help=(
+            'json or yaml file with a `mirrors` list, each entry takes the '
+            'same options as `pre-commit-mirror`.  Relative `repo_path`s are '
+            'relative to the manifest.'
+        ),
+    )
+    parser.add_argument(
+        '--jobs', type=int, default=8,
+        help='Number of concurrent version lookups (default %(default)s).',
+    )
+    parser.add_argument(
+        '--git-jobs', type=int,
+        help='Number of repositories updated in parallel (default: # cpus).',
+    )
+    parser.add_argument(
+        '--timings', action='store_true',
+        help='Print how long each phase took for every mirror.',
+    )
+    args = parser.parse_args(argv)
+
+    timings: dict[str, dict[str, float]] = {}
+    results = run(
+        load_manifest(args.manifest),
+        root=os.path.dirname(args.manifest),
+        jobs=args.jobs,
+        git_jobs=args.git_jobs,
+        timings=timings,
+    )
+
+    failed = 0
+    for repo_path, error in sorted(results.items()):
+        if error is None:
+            print(f'{repo_path}: ok')
+            if args.timings:
+                print(f'    {format_timings(timings[repo_path])}')
+        else:
+            failed += 1
+            print(f'{repo_path}: FAILED')
+            for line in error.splitlines():
+                print(f'    {line}')
+    print(f'{len(results) - failed} updated, {failed} failed')
+    return int(bool(failed))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,441 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import hashlib
+import http.client
+import io
+import json
+import os.path
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Mapping
+from typing import Any
+from typing import IO
+from typing import NamedTuple
+from typing import TypeVar
+
+T = TypeVar('T')
+
+if sys.platform == 'win32':  # pragma: win32 cover
+    import msvcrt
+
+    def _try_lock(fd: int, *, blocking: bool) -> bool:
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(.1)
+            else:
+                return True
+
+    def _unlock(fd: int) -> None:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:  # pragma: win32 no cover
+    import fcntl
+
+    def _try_lock(fd: int, *, blocking: bool) -> bool:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            return False
+        else:
+            return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+USER_AGENT = (
+    'pre-commit-mirror-maker '
+    '(+https://github.com/pre-commit/pre-commit-mirror-maker)'
+)
+TIMEOUT = 60
+MAX_REDIRECTS = 10
+
+
+class ConnectionPool:
+    """Keep-alive connections, reused per `(scheme, host)`.
+
+    `urllib.request.urlopen` opens (and TLS handshakes) a fresh connection
+    for every request, this hands out idle connections to the same host
+    instead.  Safe to share between threads.
+    """
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]]
+        self._idle = collections.defaultdict(list)
+
+    def _get(self, key: tuple[str, str]) -> http.client.HTTPConnection | None:
+        with self._lock:
+            idle = self._idle[key]
+            return idle.pop() if idle else None
+
+    def _release(
+            self,
+            key: tuple[str, str],
+            conn: http.client.HTTPConnection,
+            resp: http.client.HTTPResponse,
+    ) -> None:
+        # the connection can only be reused once the response is consumed
+        if resp.isclosed() and not resp.will_close:
+            with self._lock:
+                idle = self._idle[key]
+                if len(idle) < self.maxsize:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, collections.defaultdict(list)
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _response(
+            self,
+            key: tuple[str, str],
+            path: str,
+            headers: Mapping[str, str],
+    ) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        headers = {'User-Agent': USER_AGENT, **headers}
+
+        conn = self._get(key)
+        if conn is not None:
+            try:
+                conn.request('GET', path, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # the server closed the idle connection, use a fresh one
+                conn.close()
+
+        scheme, netloc = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(netloc, timeout=TIMEOUT)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=TIMEOUT)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    @contextlib.contextmanager
+    def urlopen(
+            self,
+            url: str,
+            headers: Mapping[str, str],
+    ) -> Generator[http.client.HTTPResponse]:
+        """Like `urllib.request.urlopen`: follows redirects and raises
+        `urllib.error.HTTPError` for non-2xx responses.
+        """
+        for _ in range(MAX_REDIRECTS):
+            parsed = urllib.parse.urlsplit(url)
+            key = (parsed.scheme, parsed.netloc)
+            path = parsed.path or '/'
+            if parsed.query:
+                path = f'{path}?{parsed.query}'
+            conn, resp = self._response(key, path, headers)
+            if 300 <= resp.status < 400 and 'Location' in resp.headers:
+                resp.read()
+                self._release(key, conn, resp)
+                url = urllib.parse.urljoin(url, resp.headers['Location'])
+            elif not 200 <= resp.status < 300:
+                body = resp.read()
+                self._release(key, conn, resp)
+                raise urllib.error.HTTPError(
+                    url, resp.status, resp.reason, resp.headers,
+                    io.BytesIO(body),
+                )
+            else:
+                try:
+                    yield resp
+                finally:
+                    self._release(key, conn, resp)
+                return
+
+        raise OSError(f'{url}: too many redirects')
+
+
+POOL = ConnectionPool()
+
+
+def _uses_proxy(url: str) -> bool:
+    parsed = urllib.parse.urlsplit(url)
+    proxies = urllib.request.getproxies()
+    return (
+        parsed.scheme in proxies and
+        not urllib.request.proxy_bypass(parsed.hostname or '')
+    )
+
+
+@contextlib.contextmanager
+def urlopen(
+        url: str,
+        headers: Mapping[str, str],
+) -> Generator[http.client.HTTPResponse]:
+    if _uses_proxy(url):
+        headers = {'User-Agent': USER_AGENT, **headers}
+        req = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
+            yield resp
+    else:
+        with POOL.urlopen(url, headers) as resp:
+            yield resp
+
+
+def _default_directory() -> str:
+    ret = os.environ.get('PRE_COMMIT_MIRROR_MAKER_CACHE_DIR')
+    if ret:
+        return ret
+    cache_home = os.environ.get('XDG_CACHE_HOME') or '~/.cache'
+    cache_home = os.path.expanduser(cache_home)
+    return os.path.join(cache_home, 'pre-commit-mirror-maker')
+
+
+# seconds during which a cached response is used without asking
+DEFAULT_TTL = 0.
+# total size in bytes of the cache directory before evicting entries
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+# seconds past the ttl during which a cached response is used while another
+# run revalidates it
+DEFAULT_STALE = 0.
+
+
+class Cache(NamedTuple):
+    directory: str
+    ttl: float = DEFAULT_TTL
+    max_size: int = DEFAULT_MAX_SIZE
+    stale: float = DEFAULT_STALE
+
+    @classmethod
+    def from_env(cls) -> Cache:
+        ttl = os.environ.get('PRE_COMMIT_MIRROR_MAKER_CACHE_TTL')
+        max_size = os.environ.get('PRE_COMMIT_MIRROR_MAKER_CACHE_MAX_SIZE')
+        stale = os.environ.get('PRE_COMMIT_MIRROR_MAKER_CACHE_STALE')
+        return cls(
+            directory=_default_directory(),
+            ttl=DEFAULT_TTL if ttl is None else float(ttl),
+            max_size=DEFAULT_MAX_SIZE if max_size is None else int(max_size),
+            stale=DEFAULT_STALE if stale is None else float(stale),
+        )
+
+
+def entry_path(cache: Cache, key: str) -> str:
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(cache.directory, f'{digest}.json')
+
+
+def _path(cache: Cache, url: str, parse: Callable[..., Any]) -> str:
+    # the same url may be parsed differently by different callers
+    return entry_path(cache, f'{url}\n{parse.__module__}.{parse.__qualname__}')
+
+
+def _lock_path(path: str) -> str:
+    return f'{os.path.splitext(path)[0]}.lock'
+
+
+@contextlib.contextmanager
+def _lock(path: str, *, blocking: bool = True) -> Generator[bool]:
+    """Hold an exclusive lock on `path` (shared by all processes and threads),
+    yields whether it was acquired: always when `blocking`.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if _try_lock(fd, blocking=blocking):
+            try:
+                yield True
+            finally:
+                _unlock(fd)
+        else:
+            yield False
+    finally:
+        os.close(fd)
+
+
+# entries this process read or wrote: `(mtime_ns, size, entry)`, so the
+# same listing is not decoded again while the file is unchanged
+_MEMORY: dict[str, tuple[int, int, dict[str, Any]]] = {}
+_MEMORY_LOCK = threading.Lock()
+
+
+def _remember(path: str, entry: dict[str, Any]) -> None:
+    with contextlib.suppress(OSError):
+        st = os.stat(path)
+        with _MEMORY_LOCK:
+            _MEMORY[path] = (st.st_mtime_ns, st.st_size, entry)
+
+
+def read_entry(path: str) -> dict[str, Any] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _MEMORY_LOCK:
+        remembered = _MEMORY.get(path)
+    if remembered is not None:
+        mtime_ns, size, entry = remembered
+        if (mtime_ns, size) == (st.st_mtime_ns, st.st_size):
+            return entry
+
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _remember(path, entry)
+    return entry
+
+
+def _evict(cache: Cache) -> None:
+    entries = []
+    for name in os.listdir(cache.directory):
+        if name.endswith('.json'):
+            path = os.path.join(cache.directory, name)
+            with contextlib.suppress(FileNotFoundError):
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+
+    # least recently used first
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= cache.max_size:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_lock_path(path))
+        total -= size
+
+
+def write_entry(cache: Cache, path: str, entry: dict[str, Any]) -> None:
+    os.makedirs(cache.directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+    try:
+        with open(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    _remember(path, entry)
+    _evict(cache)
+
+
+def _fetch(
+        cache: Cache,
+        path: str,
+        url: str,
+        parse: Callable[[IO[bytes]], T],
+        headers: Mapping[str, str] | None,
+        entry: dict[str, Any] | None,
+) -> T:
+    req_headers = dict(headers or {})
+    if entry is not None:
+        if entry['etag'] is not None:
+            req_headers['If-None-Match'] = entry['etag']
+        if entry['last_modified'] is not None:
+            req_headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        with urlopen(url, req_headers) as resp:
+            value = parse(resp)
+            etag = resp.headers.get('ETag')
+            last_modified = resp.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry is not None:
+            entry = {**entry, 'fetched': time.time()}
+            write_entry(cache, path, entry)
+            return entry['value']
+        raise
+
+    entry = {
+        'url': url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'fetched': time.time(),
+        'value': value,
+    }
+    write_entry(cache, path, entry)
+    return value
+
+
+def get(
+        url: str,
+        parse: Callable[[IO[bytes]], T],
+        *,
+        headers: Mapping[str, str] | None = None,
+        cache: Cache | None = None,
+) -> T:
+    """Fetch `url` and return `parse(response)`, caching the parsed value.
+
+    A cached value younger than the cache's ttl is returned without any
+    request, otherwise the request is made conditional on the cached
+    `ETag` / `Last-Modified` and the cached value is reused on a 304.
+    `parse` must return something json serializable.
+
+    Runs (and threads) wanting the same url take turns, those which waited
+    use what the first one fetched.  Within the `stale` window after the
+    ttl, a run finding another one revalidating uses the cached value
+    rather than waiting.
+    """
+    if cache is None:
+        cache = Cache.from_env()
+    path = _path(cache, url, parse)
+    entry = read_entry(path)
+
+    started = time.time()
+    if entry is not None:
+        age = started - entry['fetched']
+        if age < cache.ttl:
+            os.utime(path)
+            _remember(path, entry)
+            return entry['value']
+        blocking = age >= cache.ttl + cache.stale
+    else:
+        blocking = True
+
+    os.makedirs(cache.directory, exist_ok=True)
+    with _lock(_lock_path(path), blocking=blocking) as locked:
+        if not locked:
+            assert entry is not None
+            return entry['value']
+
+        # another run may have fetched it while this one waited
+        entry = read_entry(path)
+        if entry is not None and (
+                entry['fetched'] >= started or
+                time.time() - entry['fetched'] < cache.ttl
+        ):
+            return entry['value']
+
+        return _fetch(cache, path, url, parse, headers, entry)
+
+
+async def get_async(
+        url: str,
+        parse: Callable[[IO[bytes]], T],
+        *,
+        headers: Mapping[str, str] | None = None,
+        cache: Cache | None = None,
+) -> T:
+    """Coroutine version of `get`, the request runs in a worker thread."""
+    return await asyncio.to_thread(
+        get, url, parse, headers=headers, cache=cache,
+    )
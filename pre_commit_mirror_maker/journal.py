@@ -0,0 +1,54 @@
+"""Remember the plan of a long `make_repo` run so it can be resumed.
+
+The journal lives in the git directory (so it is never committed) and holds
+the versions which were planned.  What was committed is told by the tags,
+the journal only saves listing (and filtering) the versions again.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import tempfile
+from typing import Any
+
+FILENAME = 'pre-commit-mirror-maker-journal.json'
+
+
+def path(repo: str) -> str:
+    cmd = ('git', '-C', repo, 'rev-parse', '--absolute-git-dir')
+    git_dir = subprocess.check_output(cmd).decode().strip()
+    return os.path.join(git_dir, FILENAME)
+
+
+def read(filename: str, *, language: str, name: str) -> list[str] | None:
+    """The planned versions if there is a journal for this package."""
+    try:
+        with open(filename) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (entry['language'], entry['name']) != (language, name):
+        return None
+    return entry['versions']
+
+
+def write(filename: str, entry: dict[str, Any]) -> None:
+    """Atomically replace the journal, a crash leaves the old or new one."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    try:
+        with open(fd, 'w') as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def remove(filename: str) -> None:
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,126 @@
+"""Pull selected members out of a large json document as it is read.
+
+Registry responses can be tens of megabytes, mostly per-release metadata
+which is thrown away.  Rather than `json.load`ing the whole document this
+walks the top level object and hands out the members of one key a value at
+a time, so only a single release is ever decoded in memory.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from collections.abc import Generator
+from typing import Any
+from typing import IO
+
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WS = ' \t\n\r'
+
+
+class _Reader:
+    def __init__(self, fp: IO[bytes], chunk_size: int = CHUNK_SIZE) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> None:
+        # read at least as much as is pending so a value spanning many
+        # chunks is not re-parsed once per chunk
+        size = max(self.chunk_size, len(self.buf) - self.pos)
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+        # drop what was already consumed
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk, self.eof)
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, c: str) -> None:
+        if self.peek() != c:
+            raise json.JSONDecodeError(f'Expecting {c!r}', self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                ret, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # a number at the end of the buffer may continue in the next
+                # chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return ret
+            self._fill()
+
+    def members(self, close: str) -> Generator[None]:
+        """Position before each member until the `close` bracket."""
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            c = self.peek()
+            self.pos += 1
+            if c == close:
+                return
+            elif c != ',':
+                raise json.JSONDecodeError(
+                    f'Expecting , or {close}', self.buf, self.pos - 1,
+                )
+
+
+def _find(reader: _Reader, key: str) -> None:
+    reader.expect('{')
+    for _ in reader.members('}'):
+        k = reader.value()
+        reader.expect(':')
+        if k == key:
+            return
+        reader.value()
+    raise KeyError(key)
+
+
+def object_items(
+        fp: IO[bytes],
+        key: str,
+        *,
+        chunk_size: int = CHUNK_SIZE,
+) -> Generator[tuple[str, Any]]:
+    """Yield the `(key, value)` pairs of the object at `document[key]`."""
+    reader = _Reader(fp, chunk_size)
+    _find(reader, key)
+    reader.expect('{')
+    for _ in reader.members('}'):
+        k = reader.value()
+        reader.expect(':')
+        yield k, reader.value()
+
+
+def array_items(
+        fp: IO[bytes],
+        key: str,
+        *,
+        chunk_size: int = CHUNK_SIZE,
+) -> Generator[Any]:
+    """Yield the items of the array at `document[key]`."""
+    reader = _Reader(fp, chunk_size)
+    _find(reader, key)
+    reader.expect('[')
+    for _ in reader.members(']'):
+        yield reader.value()
@@ -1,69 +1,369 @@
 from __future__ import annotations
 
+import asyncio
+import html
 import json
 import os
 import re
-import subprocess
 import urllib.error
-import urllib.request
+from typing import IO
 
 from packaging import requirements
-from packaging import version
+from packaging import utils
 
+from pre_commit_mirror_maker import http_cache
+from pre_commit_mirror_maker import json_stream
+from pre_commit_mirror_maker import version_order
 
-def ruby_get_package_versions(package_name: str) -> list[str]:
-    url = f'https://rubygems.org/api/v1/versions/{package_name}.json'
-    resp = json.load(urllib.request.urlopen(url))
-    return list(reversed([version['number'] for version in resp]))
 
+RUBYGEMS = 'https://rubygems.org'
+NPM_REGISTRY = 'https://registry.npmjs.org/'
+PYPI_SIMPLE = 'https://pypi.org/simple/'
+CRATES_IO = 'https://crates.io'
+GOPROXY = 'https://proxy.golang.org'
 
-def node_get_package_versions(package_name: str) -> list[str]:
-    cmd = ('npm', 'view', package_name, '--json')
-    output = json.loads(subprocess.check_output(cmd))
-    return output['versions']
 
+def _ruby_versions(resp: IO[bytes]) -> list[str]:
+    return list(reversed([version['number'] for version in json.load(resp)]))
 
-def python_get_package_versions(package_name: str) -> list[str]:
-    pypi_name = requirements.Requirement(package_name).name
-    url = f'https://pypi.org/pypi/{pypi_name}/json'
-    resp = json.load(urllib.request.urlopen(url))
-    return sorted(resp['releases'], key=lambda k: version.parse(k))
+
+async def ruby_get_package_versions_async(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    # rubygems.org does not list yanked versions
+    url = f'{RUBYGEMS}/api/v1/versions/{package_name}.json'
+    return await http_cache.get_async(url, _ruby_versions)
+
+
+def _npm_env(key: str) -> str | None:
+    # npm reads `npm_config_*` case insensitively
+    for k, v in os.environ.items():
+        if k.lower() == f'npm_config_{key}':
+            return v
+    return None
+
+
+def _npmrc() -> dict[str, str]:
+    """Read the user and then project `.npmrc` (later wins)."""
+    userconfig = _npm_env('userconfig') or os.path.expanduser('~/.npmrc')
+    ret = {}
+    for filename in (userconfig, '.npmrc'):
+        try:
+            with open(filename) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(('#', ';')) or '=' not in line:
+                continue
+            key, _, value = line.partition('=')
+            value = re.sub(
+                r'\$\{([^}]+)\}',
+                lambda m: os.environ.get(m[1], ''),
+                value.strip().strip('"'),
+            )
+            ret[key.strip()] = value
+    return ret
+
+
+def _npm_registry(package_name: str) -> tuple[str, dict[str, str]]:
+    npmrc = _npmrc()
+    registry = None
+    if package_name.startswith('@'):
+        scope, _, _ = package_name.partition('/')
+        registry = npmrc.get(f'{scope}:registry')
+    if registry is None:
+        registry = _npm_env('registry') or npmrc.get('registry', NPM_REGISTRY)
+    registry = f'{registry.rstrip("/")}/'
+
+    headers = {
+        # the abbreviated metadata is much smaller than the full packument
+        'Accept': (
+            'application/vnd.npm.install-v1+json; q=1.0, '
+            'application/json; q=0.8'
+        ),
+    }
+    # credentials are keyed by the registry url without its scheme
+    _, _, nerf_dart = registry.partition(':')
+    token = npmrc.get(f'{nerf_dart}:_authToken')
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+
+    return registry, headers
+
+
+def _node_versions(resp: IO[bytes]) -> list[str]:
+    # same order as `npm view --json`: publication order
+    return list(json.load(resp)['versions'])
+
+
+async def node_get_package_versions_async(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    # npm has no yanking, unpublished versions are gone from the registry
+    registry, headers = _npm_registry(package_name)
+    url = f'{registry}{package_name.replace("/", "%2f")}'
+    return await http_cache.get_async(url, _node_versions, headers=headers)
+
+
+def _without(versions: list[str], remove: list[str]) -> list[str]:
+    if remove:
+        remove_set = set(remove)
+        return [v for v in versions if v not in remove_set]
+    else:
+        return versions
 
 
-def rust_get_package_versions(package_name: str) -> list[str]:
-    url = f'https://crates.io/api/v1/crates/{package_name}'
-    resp = json.load(urllib.request.urlopen(url))
-    return list(reversed([version['num'] for version in resp['versions']]))
+def _version_from_filename(filename: str) -> str | None:
+    try:
+        if filename.endswith('.whl'):
+            _, v, _, _ = utils.parse_wheel_filename(filename)
+        else:
+            _, v = utils.parse_sdist_filename(filename)
+    except (utils.InvalidWheelFilename, utils.InvalidSdistFilename):
+        return None
+    return str(v)
+
+
+def _python_releases(resp: IO[bytes]) -> tuple[list[str], list[str]]:
+    """Return `(versions, yanked versions)` from a simple api page.
+
+    A version is yanked when all of its files are.
+    """
+    body = resp.read()
+    # PEP 691 json, or the PEP 503 html page from an older index
+    files: list[tuple[str, bool]]
+    if body.lstrip().startswith(b'{'):
+        page = json.loads(body)
+        # PEP 700
+        listed = page.get('versions')
+        files = [
+            (file['filename'], bool(file.get('yanked')))
+            for file in page['files']
+        ]
+    else:
+        listed = None
+        links = re.findall(r'<a\b([^>]*)>([^<]*)</a>', body.decode())
+        files = [
+            (html.unescape(text), 'data-yanked' in attrs)
+            for attrs, text in links
+        ]
+
+    if listed is not None and not any(y for _, y in files):
+        return listed, []
+
+    # whether all files of a version are yanked
+    yanked: dict[str, bool] = {}
+    for filename, file_yanked in files:
+        v = _version_from_filename(filename)
+        if v is not None:
+            yanked[v] = yanked.get(v, True) and file_yanked
+
+    if listed is None:
+        return list(yanked), [v for v, y in yanked.items() if y]
+    else:
+        # PEP 700 versions are as uploaded: `1.0` may be `1.0.0` in filenames
+        canonical = {
+            utils.canonicalize_version(v): y for v, y in yanked.items()
+        }
+        return listed, [
+            v for v in listed
+            if canonical.get(utils.canonicalize_version(v))
+        ]
+
+
+async def python_get_package_versions_async(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    pypi_name = utils.canonicalize_name(
+        requirements.Requirement(package_name).name,
+    )
+    index_url = os.environ.get('PIP_INDEX_URL') or PYPI_SIMPLE
+    url = f'{index_url.rstrip("/")}/{pypi_name}/'
+    headers = {
+        'Accept': (
+            'application/vnd.pypi.simple.v1+json, '
+            'text/html; q=0.01'
+        ),
+    }
+    versions, yanked_versions = await http_cache.get_async(
+        url, _python_releases, headers=headers,
+    )
+    # the order of all of them is kept so it is the same either way
+    ret = await asyncio.to_thread(
+        version_order.sort_versions, 'python', pypi_name, versions,
+    )
+    if not yanked:
+        ret = _without(ret, yanked_versions)
+    return ret
+
+
+def _rust_releases(resp: IO[bytes]) -> tuple[list[str], list[str]]:
+    """Return `(versions, yanked versions)`, oldest first."""
+    versions = []
+    yanked = []
+    for release in json_stream.array_items(resp, 'versions'):
+        versions.append(release['num'])
+        if release.get('yanked'):
+            yanked.append(release['num'])
+    versions.reverse()
+    return versions, yanked
+
+
+async def rust_get_package_versions_async(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    url = f'{CRATES_IO}/api/v1/crates/{package_name}'
+    versions, yanked_versions = await http_cache.get_async(
+        url, _rust_releases,
+    )
+    if not yanked:
+        versions = _without(versions, yanked_versions)
+    return versions
 
 
-def golang_get_package_versions(package_name: str) -> list[str]:
+def _golang_versions(resp: IO[bytes]) -> list[str]:
+    return [v.removeprefix('v') for v in resp.read().decode().splitlines()]
+
+
+def _goproxies() -> list[tuple[str, bool]]:
+    """Parse `$GOPROXY` into `(proxy, fall back on any error)` pairs.
+
+    Like `go`: after a `,` the next proxy is only tried when the module is
+    not found, after a `|` it is tried on any error.
+    """
+    ret = []
+    value = os.environ.get('GOPROXY') or GOPROXY
+    for proxy, sep in re.findall(r'([^,|]+)([,|]?)', value):
+        proxy = proxy.strip()
+        if proxy == 'off':
+            break
+        elif proxy == 'direct':  # fetching from version control is not done
+            continue
+        ret.append((proxy.rstrip('/'), sep == '|'))
+    return ret
+
+
+def _not_found(e: urllib.error.HTTPError) -> bool:
+    return e.code in {404, 410}
+
+
+async def _golang_probe(
+        proxy: str,
+        candidates: list[str],
+) -> tuple[str, list[str]] | None:
+    results = await asyncio.gather(
+        *(
+            http_cache.get_async(f'{proxy}/{c}/@v/list', _golang_versions)
+            for c in candidates
+        ),
+        return_exceptions=True,
+    )
+    # Greedily choose the longest non-404 path
+    # (based on https://go.dev/ref/mod#resolve-pkg-mod)
+    for candidate, result in zip(candidates, results):
+        if isinstance(result, urllib.error.HTTPError) and _not_found(result):
+            continue
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            return candidate, result
+    return None
+
+
+async def golang_get_package_versions_async(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    # retracted versions are declared in the latest `go.mod` which is not
+    # fetched, they are listed like any other
     # https://pkg.go.dev/golang.org/x/mod/module#EscapePath
     # https://github.com/golang/mod/blob/d271cf332fd221d661d13b186b51a11d7e66ff74/module/module.go#L707
     escaped = re.sub(
         r'[A-Z]',
         lambda m: f'!{m.group(0).lower()}', package_name,
     )
-
-    # Greedily choose the longest non-404 path
-    # (based on https://go.dev/ref/mod#resolve-pkg-mod)
+    # the module is one of the package's path prefixes, longest first
+    candidates = []
     while escaped:
-        url = f'https://proxy.golang.org/{escaped}/@v/list'
+        candidates.append(escaped)
+        escaped = os.path.dirname(escaped)
+
+    # remember which prefix is the module, the next run needs one request
+    cache = http_cache.Cache.from_env()
+    mapping_path = http_cache.entry_path(cache, f'gomodule\n{package_name}')
+    entry = http_cache.read_entry(mapping_path)
+
+    proxies = _goproxies()
+    for proxy, fallback_on_error in proxies:
         try:
-            resp = urllib.request.urlopen(url).read().decode()
-        except urllib.error.HTTPError as exc:
-            if exc.code == 404:
-                escaped = os.path.dirname(escaped)
+            found = None
+            if entry is not None and entry['module'] in candidates:
+                found = await _golang_probe(proxy, [entry['module']])
+            if found is None:
+                found = await _golang_probe(proxy, candidates)
+        except Exception:
+            if fallback_on_error:
                 continue
             raise
+        if found is None:
+            continue
 
-        return sorted(
-            (v.removeprefix('v') for v in resp.splitlines()),
-            key=version.parse,
+        module, versions = found
+        if entry is None or entry['module'] != module:
+            entry = {'package': package_name, 'module': module}
+            http_cache.write_entry(cache, mapping_path, entry)
+        return await asyncio.to_thread(
+            version_order.sort_versions, 'golang', package_name, versions,
         )
 
-    raise ValueError(
-        f'Cannot find package name {package_name} on proxy.golang.org',
-    )
+    where = ', '.join(proxy for proxy, _ in proxies) or 'GOPROXY'
+    raise ValueError(f'Cannot find package name {package_name} on {where}')
+
+
+def ruby_get_package_versions(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    coro = ruby_get_package_versions_async(package_name, yanked=yanked)
+    return asyncio.run(coro)
+
+
+def node_get_package_versions(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    coro = node_get_package_versions_async(package_name, yanked=yanked)
+    return asyncio.run(coro)
+
+
+def python_get_package_versions(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    coro = python_get_package_versions_async(package_name, yanked=yanked)
+    return asyncio.run(coro)
+
+
+def rust_get_package_versions(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    coro = rust_get_package_versions_async(package_name, yanked=yanked)
+    return asyncio.run(coro)
+
+
+def golang_get_package_versions(
+        package_name: str, *,
+        yanked: bool = True,
+) -> list[str]:
+    coro = golang_get_package_versions_async(package_name, yanked=yanked)
+    return asyncio.run(coro)
 
 
 def node_get_additional_dependencies(
@@ -84,6 +384,14 @@ def golang_get_additional_dependencies(
     return [f'{package_name}@v{package_version}']
 
 
+LIST_VERSIONS_ASYNC = {
+    'golang': golang_get_package_versions_async,
+    'node': node_get_package_versions_async,
+    'python': python_get_package_versions_async,
+    'ruby': ruby_get_package_versions_async,
+    'rust': rust_get_package_versions_async,
+}
+
 LIST_VERSIONS = {
     'golang': golang_get_package_versions,
     'node': node_get_package_versions,
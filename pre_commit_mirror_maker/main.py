@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from collections.abc import Sequence
+from typing import Any
 
+from pre_commit_mirror_maker.make_repo import format_timings
 from pre_commit_mirror_maker.make_repo import LIST_VERSIONS
 from pre_commit_mirror_maker.make_repo import make_repo
+from pre_commit_mirror_maker.make_repo import plan_repo
+from pre_commit_mirror_maker.version_filter import VersionFilter
 
 
 def split_by_commas(maybe_s: str) -> tuple[str, ...]:
@@ -27,20 +32,7 @@ def split_by_commas(maybe_s: str) -> tuple[str, ...]:
     return tuple(parts)
 
 
-def main(argv: Sequence[str] | None = None) -> int:
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        'repo_path',
-        help='Local path where the git repo is checked out.',
-    )
-    parser.add_argument(
-        '--language', required=True, choices=LIST_VERSIONS,
-        help='Which language to use.',
-    )
-    parser.add_argument(
-        '--package-name', required=True,
-        help='Package name as it appears on the remote package manager.',
-    )
+def _add_hook_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         '--description', help='Hook description.', default='',
     )
@@ -73,8 +65,92 @@ def main(argv: Sequence[str] | None = None) -> int:
         '--require-serial', action='store_true',
         help='Set `require_serial: true` for the hook',
     )
-    args = parser.parse_args(argv)
 
+
+def _positive_int(s: str) -> int:
+    n = int(s)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {n}')
+    return n
+
+
+def make_hook_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='--hook')
+    _add_hook_arguments(parser)
+    return parser
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'repo_path',
+        help='Local path where the git repo is checked out.',
+    )
+    parser.add_argument(
+        '--language', required=True, choices=LIST_VERSIONS,
+        help='Which language to use.',
+    )
+    parser.add_argument(
+        '--package-name', required=True,
+        help='Package name as it appears on the remote package manager.',
+    )
+    _add_hook_arguments(parser)
+    parser.add_argument(
+        '--hook', nargs=argparse.REMAINDER, default=[],
+        help=(
+            'Add another hook for the same package: the hook options (`--id`, '
+            '`--entry`, `--types`, ...) which follow describe it.  May be '
+            'repeated, must come last.'
+        ),
+    )
+    parser.add_argument(
+        '--versions', metavar='SPECIFIER', default='',
+        help=(
+            'Only mirror versions matching this PEP 440 specifier set, for '
+            "example --versions='>=2,!=2.1.*'."
+        ),
+    )
+    parser.add_argument(
+        '--stable-only', action='store_true',
+        help='Skip pre-releases and dev releases.',
+    )
+    parser.add_argument(
+        '--skip-yanked', action='store_true',
+        help='Skip versions yanked upstream (pypi, crates.io).',
+    )
+    parser.add_argument(
+        '--latest', type=_positive_int, metavar='N',
+        help='Only consider the newest N (matching) versions.',
+    )
+    parser.add_argument(
+        '--bulk', action='store_true',
+        help=(
+            'Commit all new versions through a single `git fast-import` '
+            'instead of running `git` several times per version.'
+        ),
+    )
+    parser.add_argument(
+        '--checkpoint', type=_positive_int, metavar='N',
+        help=(
+            'Journal the run and record progress every N versions so an '
+            'interrupted run is resumed by the next one.'
+        ),
+    )
+    parser.add_argument(
+        '--plan', action='store_true',
+        help=(
+            'Print what would be committed as json (versions, rendered file '
+            'hashes, additional_dependencies) without changing the repo.'
+        ),
+    )
+    parser.add_argument(
+        '--timings', action='store_true',
+        help='Print how long each phase (list, render, git ...) took.',
+    )
+    return parser
+
+
+def _hook_vars(args: argparse.Namespace, package_name: str) -> dict[str, str]:
     minimum_pre_commit_version = '0'
 
     if args.types_or:
@@ -88,19 +164,16 @@ def main(argv: Sequence[str] | None = None) -> int:
         match_key = 'files'
         match_val = args.files_regex
 
-    hook_id = args.id or args.entry or args.package_name
+    hook_id = args.id or args.entry or package_name
     if ' ' in hook_id:
         raise SystemExit(
             f'hook id should not contain spaces, perhaps specify --id?\n\n'
             f'-   id: {hook_id}',
         )
 
-    make_repo(
-        args.repo_path,
-        name=args.package_name,
+    return dict(
         description=args.description,
-        language=args.language,
-        entry=args.entry or args.package_name,
+        entry=args.entry or package_name,
         id=hook_id,
         match_key=match_key,
         match_val=match_val,
@@ -108,6 +181,73 @@ def main(argv: Sequence[str] | None = None) -> int:
         require_serial=json.dumps(args.require_serial),
         minimum_pre_commit_version=minimum_pre_commit_version,
     )
+
+
+def _split_hooks(argv: list[str]) -> list[list[str]]:
+    ret: list[list[str]] = [[]]
+    for arg in argv:
+        if arg == '--hook':
+            ret.append([])
+        else:
+            ret[-1].append(arg)
+    return ret
+
+
+def make_repo_kwargs(args: argparse.Namespace) -> dict[str, Any]:
+    """Translate parsed arguments into keyword arguments for `make_repo`."""
+    try:
+        version_filter = VersionFilter.compile(
+            specifier=args.versions,
+            stable=args.stable_only,
+            skip_yanked=args.skip_yanked,
+            latest=args.latest,
+        )
+    except ValueError as e:
+        raise SystemExit(f'invalid --versions: {e}')
+
+    ret = dict(
+        name=args.package_name,
+        language=args.language,
+        bulk=args.bulk,
+        checkpoint=args.checkpoint,
+        version_filter=version_filter,
+        **_hook_vars(args, args.package_name),
+    )
+    if args.hook:
+        hooks = [
+            _hook_vars(make_hook_parser().parse_args(argv), args.package_name)
+            for argv in _split_hooks(args.hook)
+        ]
+        ids = [ret['id'], *(hook['id'] for hook in hooks)]
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        if duplicates:
+            raise SystemExit(
+                f'hook ids must be unique, perhaps specify --id?  '
+                f'duplicated: {", ".join(duplicates)}',
+            )
+        ret['hooks'] = hooks
+    return ret
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = make_parser().parse_args(argv)
+    kwargs = make_repo_kwargs(args)
+    timings: dict[str, float] = {}
+    saved: dict[str, int] = {}
+    if args.plan:
+        del kwargs['bulk'], kwargs['checkpoint']
+        plan = plan_repo(
+            args.repo_path, timings=timings, saved=saved, **kwargs,
+        )
+        plan['timings'] = timings
+        plan['saved'] = saved
+        print(json.dumps(plan, indent=2))
+    else:
+        make_repo(args.repo_path, timings=timings, saved=saved, **kwargs)
+        if args.timings:
+            print(f'timings: {format_timings(timings)}', file=sys.stderr)
+            saved_s = ' '.join(f'{k}={n}' for k, n in saved.items())
+            print(f'saved: {saved_s}', file=sys.stderr)
     return 0
 
 
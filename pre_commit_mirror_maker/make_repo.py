@@ -1,12 +1,97 @@
 from __future__ import annotations
 
+import contextlib
+import functools
+import hashlib
 import importlib.resources
 import json
 import os.path
+import pathlib
+import string
 import subprocess
+import sys
+import time
+from collections.abc import Callable
+from collections.abc import Collection
+from collections.abc import Generator
+from collections.abc import Mapping
+from collections.abc import Sequence
+from typing import Any
+from typing import NamedTuple
 
+import packaging.version
+
+from pre_commit_mirror_maker import journal
 from pre_commit_mirror_maker.languages import ADDITIONAL_DEPENDENCIES
 from pre_commit_mirror_maker.languages import LIST_VERSIONS
+from pre_commit_mirror_maker.version_filter import VersionFilter
+
+if sys.version_info >= (3, 11):  # pragma: >=3.11 cover
+    from importlib.resources.abc import Traversable
+else:  # pragma: <3.11 cover
+    from importlib.abc import Traversable
+
+_FORMATTER = string.Formatter()
+HOOKS_FILE = '.pre-commit-hooks.yaml'
+
+
+class Template(NamedTuple):
+    """A template pre-split into `(literal, field, spec, conversion)`
+    segments so it can be rendered many times without re-parsing.
+    """
+    segments: tuple[tuple[str, str | None, str, str | None], ...]
+
+    @classmethod
+    def parse(cls, s: str) -> Template:
+        return cls(
+            tuple(
+                (literal, field, spec or '', conversion)
+                for literal, field, spec, conversion in _FORMATTER.parse(s)
+            ),
+        )
+
+    @property
+    def fields(self) -> frozenset[str]:
+        """The names of the variables used, including in format specs."""
+        ret = set()
+        for _, field, spec, _ in self.segments:
+            if field is not None:
+                # `{a.b}` / `{a[0]}` use `a`
+                ret.add(field.partition('.')[0].partition('[')[0])
+                ret.update(Template.parse(spec).fields)
+        return frozenset(ret)
+
+    def render(self, fmt_vars: Mapping[str, str]) -> str:
+        parts = []
+        for literal, field, spec, conversion in self.segments:
+            parts.append(literal)
+            if field is not None:
+                value, _ = _FORMATTER.get_field(field, (), fmt_vars)
+                value = _FORMATTER.convert_field(value, conversion)
+                if '{' in spec:
+                    spec = spec.format_map(fmt_vars)
+                parts.append(format(value, spec))
+        return ''.join(parts)
+
+
+def _load_templates(src: Traversable) -> dict[str, Template]:
+    # Only at the root.  Could be made more complicated and recursive later
+    return {
+        # Flat directory structure
+        path.name: Template.parse(path.read_text())
+        for path in src.iterdir()
+        if path.is_file()
+    }
+
+
+@functools.cache
+def _package_templates(language: str) -> dict[str, Template]:
+    # 'all' writes the .version and .pre-commit-hooks.yaml files
+    files = importlib.resources.files('pre_commit_mirror_maker')
+    ret = {}
+    for lang in ('all', language):
+        ret.update(_load_templates(files.joinpath(lang)))
+    return ret
 
 
 def format_files(src: os.PathLike[str], dest: str, **fmt_vars: str) -> None:
@@ -28,75 +113,561 @@ def format_files(src: os.PathLike[str], dest: str, **fmt_vars: str) -> None:
     """
     assert os.path.exists(src)
     assert os.path.exists(dest)
-    # Only at the root.  Could be made more complicated and recursive later
-    for filename in os.listdir(src):
-        # Flat directory structure
-        if not os.path.isfile(os.path.join(src, filename)):
-            continue
-        with open(os.path.join(src, filename)) as f:
-            output_contents = f.read().format(**fmt_vars)
+    for filename, template in _load_templates(pathlib.Path(src)).items():
         with open(os.path.join(dest, filename), 'w') as file_obj:
-            file_obj.write(output_contents)
+            file_obj.write(template.render(fmt_vars))
+
+
+def _invariant_files(language: str) -> frozenset[str]:
+    """The files which render the same for every version of a package."""
+    version_fields = {'version'}
+    if language in ADDITIONAL_DEPENDENCIES:
+        version_fields.add('additional_dependencies')
+    return frozenset(
+        filename
+        for filename, template in _package_templates(language).items()
+        if not template.fields & version_fields
+    )
+
+
+def _render_version(
+        *,
+        language: str,
+        version: str,
+        skip: Collection[str] = frozenset(),
+        hooks: Sequence[Mapping[str, str]] = (),
+        **fmt_vars: str,
+) -> dict[str, str]:
+    """Render the files for `version`.
+
+    `hooks` are additional hook definitions (`id`, `entry`, `args`, ...)
+    which are appended to the `.pre-commit-hooks.yaml` of the first one.
+    """
+    fmt_vars.update(language=language, version=version)
+    ret = {}
+    for filename, template in _package_templates(language).items():
+        if filename in skip:
+            continue
+        ret[filename] = template.render(fmt_vars)
+        if filename == HOOKS_FILE:
+            ret[filename] += ''.join(
+                template.render({**fmt_vars, **hook}) for hook in hooks
+            )
+    return ret
+
+
+def _write_if_changed(path: str, contents: str) -> None:
+    # an untouched file keeps its stat data so git does not hash it again
+    try:
+        with open(path) as f:
+            if f.read() == contents:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path, 'w') as f:
+        f.write(contents)
+
+
+@contextlib.contextmanager
+def _timed(timings: dict[str, float] | None, phase: str) -> Generator[None]:
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            elapsed = time.monotonic() - t0
+            timings[phase] = timings.get(phase, 0) + elapsed
+
+
+def _count(counts: dict[str, int] | None, **kwargs: int) -> None:
+    if counts is not None:
+        for k, n in kwargs.items():
+            counts[k] = counts.get(k, 0) + n
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    return ' '.join(f'{phase}={t:.3f}s' for phase, t in timings.items())
 
 
 def _commit_version(
         repo: str, *,
         language: str,
         version: str,
+        skip: Collection[str] = frozenset(),
+        hooks: Sequence[Mapping[str, str]] = (),
+        timings: dict[str, float] | None = None,
+        saved: dict[str, int] | None = None,
         **fmt_vars: str,
 ) -> None:
-    # 'all' writes the .version and .pre-commit-hooks.yaml files
-    files = importlib.resources.files('pre_commit_mirror_maker')
-    with importlib.resources.as_file(files) as files_p:
-        for lang in ('all', language):
-            src = files_p.joinpath(lang)
-            format_files(
-                src,
-                repo,
-                language=language,
-                version=version,
-                **fmt_vars,
-            )
+    """Commit and tag `version`.
 
-    hooks_yaml = os.path.join(repo, 'hooks.yaml')
-    if os.path.exists(hooks_yaml):
-        os.remove(hooks_yaml)
+    Files in `skip` are known to be up to date (an earlier version in the
+    same run wrote them) and are neither rendered nor staged.
+    """
+    with _timed(timings, 'render'):
+        rendered = _render_version(
+            language=language, version=version, skip=skip, hooks=hooks,
+            **fmt_vars,
+        )
+        _count(saved, writes=len(skip), hashes=len(skip))
+        for filename, contents in rendered.items():
+            _write_if_changed(os.path.join(repo, filename), contents)
+
+        hooks_yaml = os.path.join(repo, 'hooks.yaml')
+        if os.path.exists(hooks_yaml):
+            os.remove(hooks_yaml)
 
     def git(*cmd: str) -> None:
-        subprocess.check_call(('git', '-C', repo) + cmd)
+        with _timed(timings, f'git {cmd[0]}'):
+            subprocess.check_call(('git', '-C', repo) + cmd)
 
-    # Commit and tag
-    git('add', '.')
+    # Commit and tag.  Only our files are staged: the rest of the worktree
+    # is neither scanned nor committed.  `--remove` drops `hooks.yaml` if it
+    # was tracked.
+    paths = (*sorted(rendered), 'hooks.yaml')
+    git('update-index', '--add', '--remove', '--', *paths)
     git('commit', '-m', f'Mirror: {version}')
     git('tag', f'v{version}')
 
 
-def make_repo(repo: str, *, language: str, name: str, **fmt_vars: str) -> None:
-    assert os.path.exists(os.path.join(repo, '.git')), repo
+def _version_vars(language: str, name: str, version: str) -> dict[str, str]:
+    if language in ADDITIONAL_DEPENDENCIES:
+        additional_dependencies = ADDITIONAL_DEPENDENCIES[language](
+            name,
+            version,
+        )
+    else:
+        additional_dependencies = []
+
+    return {'additional_dependencies': json.dumps(additional_dependencies)}
+
+
+def _data(b: bytes) -> bytes:
+    return b'data %d\n%s\n' % (len(b), b)
+
+
+def _fast_import_versions(
+        repo: str, *,
+        language: str,
+        name: str,
+        versions: Sequence[str],
+        hooks: Sequence[Mapping[str, str]] = (),
+        timings: dict[str, float] | None = None,
+        saved: dict[str, int] | None = None,
+        checkpoint: int | None = None,
+        on_checkpoint: Callable[[int], None] | None = None,
+        **fmt_vars: str,
+) -> None:
+    """Commit and tag each of `versions` on top of HEAD using a single
+    `git fast-import` process.
+
+    HEAD must have been committed by `_commit_version` in this run: the
+    version-invariant files are carried over from it rather than written
+    again.
+
+    With `checkpoint`, the branch and tags are written out every
+    `checkpoint` versions, after which `on_checkpoint` is called with the
+    number of versions committed so far.
+    """
+    def git(*cmd: str) -> str:
+        with _timed(timings, f'git {cmd[0]}'):
+            cmd = ('git', '-C', repo) + cmd
+            return subprocess.check_output(cmd).decode()
+
+    rev_parse = git('rev-parse', 'HEAD', '--symbolic-full-name', 'HEAD')
+    head, ref = rev_parse.split()
+    author = git('var', 'GIT_AUTHOR_IDENT').strip()
+    committer = git('var', 'GIT_COMMITTER_IDENT').strip()
+
+    cmd = ('git', '-C', repo, 'fast-import', '--quiet', '--done')
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    assert proc.stdin is not None and proc.stdout is not None
+
+    def send(stream: list[bytes]) -> None:
+        assert proc.stdin is not None
+        with _timed(timings, 'git fast-import'):
+            proc.stdin.write(b''.join(stream))
+            proc.stdin.flush()
+        stream.clear()
+
+    def feed() -> None:
+        assert proc.stdout is not None
+        skip = _invariant_files(language)
+        stream = [f'reset {ref}\nfrom {ref}^0\n\n'.encode()]
+        for mark, version in enumerate(versions, 1):
+            with _timed(timings, 'render'):
+                rendered = _render_version(
+                    name=name,
+                    language=language,
+                    version=version,
+                    skip=skip,
+                    hooks=hooks,
+                    **_version_vars(language, name, version),
+                    **fmt_vars,
+                )
+                _count(saved, writes=len(skip), hashes=len(skip))
+            stream.append(
+                f'commit {ref}\n'
+                f'mark :{mark}\n'
+                f'author {author}\n'
+                f'committer {committer}\n'.encode(),
+            )
+            stream.append(_data(f'Mirror: {version}\n'.encode()))
+            for filename, contents in sorted(rendered.items()):
+                stream.append(f'M 100644 inline {filename}\n'.encode())
+                stream.append(_data(contents.encode()))
+            stream.append(
+                f'\nreset refs/tags/v{version}\nfrom :{mark}\n\n'.encode(),
+            )
+
+            if (
+                    checkpoint is not None and
+                    mark % checkpoint == 0 and
+                    mark < len(versions)
+            ):
+                # refs are only written at a checkpoint (or the end), the
+                # progress line comes back once it is done
+                stream.append(b'checkpoint\n\nprogress checkpoint\n\n')
+                send(stream)
+                with _timed(timings, 'git fast-import'):
+                    line = proc.stdout.readline()
+                if line != b'progress checkpoint\n':
+                    return  # fast-import failed, its exit status says why
+                if on_checkpoint is not None:
+                    on_checkpoint(mark)
+        stream.append(b'done\n')
+        send(stream)
+
+    try:
+        try:
+            feed()
+        finally:
+            proc.stdin.close()
+    except BrokenPipeError:
+        pass  # fast-import failed, its exit status says why
+    finally:
+        with _timed(timings, 'git fast-import'):
+            proc.wait()
+        proc.stdout.close()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    # fast-import only moves the ref, bring our files in the index and
+    # worktree along (anything else in the worktree is left alone)
+    git('read-tree', '-m', '-u', head, ref)
+
 
-    package_versions = LIST_VERSIONS[language](name)
-    version_file = os.path.join(repo, '.version')
-    if os.path.exists(version_file):
-        previous_version = open(version_file).read().strip()
-        previous_version_index = package_versions.index(previous_version)
-        versions_to_apply = package_versions[previous_version_index + 1:]
+def _mirrored_versions(repo: str) -> set[str]:
+    cmd = ('git', '-C', repo, 'for-each-ref', '--format=%(refname:lstrip=2)')
+    tags = subprocess.check_output((*cmd, 'refs/tags')).decode().split()
+    return {tag.removeprefix('v') for tag in tags}
+
+
+def versions_to_apply_after(
+        package_versions: Sequence[str], *,
+        previous_version: str | None,
+        mirrored: set[str],
+) -> list[str]:
+    """Pick the upstream versions which still need a commit.
+
+    Only versions after `.version` (or when it is no longer listed, the
+    newest mirrored `v*` tag) in upstream order are considered, so a
+    version which was yanked or deleted upstream since the last run does
+    not break the lookup.  Versions which already have a tag are skipped.
+    """
+    if previous_version is not None:
+        mirrored = mirrored | {previous_version}
+    elif not mirrored:
+        return list(package_versions)
+
+    positions = {v: i for i, v in enumerate(package_versions)}
+    if previous_version in positions:
+        start = positions[previous_version] + 1
+    elif mirrored & positions.keys():
+        start = max(positions[v] for v in mirrored & positions.keys()) + 1
+    elif previous_version is None:
+        start = 0
     else:
-        versions_to_apply = package_versions
+        # nothing we mirrored is listed anymore, resume by version order
+        try:
+            previous = packaging.version.parse(previous_version)
+            return [
+                v for v in package_versions
+                if packaging.version.parse(v) > previous
+            ]
+        except packaging.version.InvalidVersion:
+            raise ValueError(
+                f'.version {previous_version} is no longer listed upstream '
+                f'and cannot be ordered against upstream versions',
+            )
+
+    return [v for v in package_versions[start:] if v not in mirrored]
+
 
-    for version in versions_to_apply:
-        if language in ADDITIONAL_DEPENDENCIES:
-            additional_dependencies = ADDITIONAL_DEPENDENCIES[language](
-                name,
-                version,
+def _versions_to_apply(
+        repo: str, *,
+        language: str,
+        name: str,
+        package_versions: Sequence[str] | None,
+        version_filter: VersionFilter,
+        timings: dict[str, float] | None,
+) -> tuple[str | None, list[str]]:
+    assert os.path.exists(os.path.join(repo, '.git')), repo
+
+    if package_versions is None:
+        with _timed(timings, 'list'):
+            package_versions = LIST_VERSIONS[language](
+                name, yanked=not version_filter.skip_yanked,
             )
+
+    with _timed(timings, 'filter'):
+        package_versions = version_filter(package_versions)
+
+    with _timed(timings, 'plan'):
+        version_file = os.path.join(repo, '.version')
+        if os.path.exists(version_file):
+            previous_version: str | None = open(version_file).read().strip()
         else:
-            additional_dependencies = []
+            previous_version = None
+        versions_to_apply = versions_to_apply_after(
+            package_versions,
+            previous_version=previous_version,
+            mirrored=_mirrored_versions(repo),
+        )
+    return previous_version, versions_to_apply
+
+
+def _recover(repo: str) -> None:
+    """Finish or undo what an interrupted run left behind.
+
+    Either the last commit is missing its tag or the index (and worktree)
+    is not at HEAD: partly staged by `_commit_version` or still at the
+    commit `git fast-import` started from.
+    """
+    def git(*cmd: str) -> str:
+        return subprocess.check_output(('git', '-C', repo, *cmd)).decode()
+
+    cmd = ('git', '-C', repo, 'rev-parse', '--quiet', '--verify', 'HEAD')
+    if subprocess.run(cmd, stdout=subprocess.DEVNULL).returncode:
+        return  # nothing was committed yet
+
+    subject = git('log', '-1', '--format=%s').strip()
+    version = subject.removeprefix('Mirror: ')
+    if version != subject and version not in _mirrored_versions(repo):
+        git('tag', f'v{version}')
+
+    # a two tree merge keeps any other local changes
+    git('read-tree', '-m', '-u', git('write-tree').strip(), 'HEAD')
+
+
+def _resume(
+        repo: str,
+        filename: str, *,
+        language: str,
+        name: str,
+        timings: dict[str, float] | None,
+) -> list[str] | None:
+    """The planned versions still to commit from an interrupted run."""
+    planned = journal.read(filename, language=language, name=name)
+    if planned is None:
+        return None
+
+    with _timed(timings, 'plan'):
+        _recover(repo)
+        mirrored = _mirrored_versions(repo)
+        versions_to_apply = [v for v in planned if v not in mirrored]
+    # a stale journal must not hold back newer versions
+    return versions_to_apply or None
+
+
+def _blob_hash(contents: str) -> str:
+    b = contents.encode()
+    return hashlib.sha1(b'blob %d\0%s' % (len(b), b)).hexdigest()
+
+
+def plan_repo(
+        repo: str, *,
+        language: str,
+        name: str,
+        package_versions: Sequence[str] | None = None,
+        version_filter: VersionFilter = VersionFilter(),
+        hooks: Sequence[Mapping[str, str]] = (),
+        timings: dict[str, float] | None = None,
+        saved: dict[str, int] | None = None,
+        **fmt_vars: str,
+) -> dict[str, Any]:
+    """Work out and render what `make_repo` would commit, without
+    changing the repository.
+
+    Files are identified by the git blob hash of their rendered contents.
+    """
+    previous_version, versions_to_apply = _versions_to_apply(
+        repo,
+        language=language,
+        name=name,
+        package_versions=package_versions,
+        version_filter=version_filter,
+        timings=timings,
+    )
+
+    invariant = _invariant_files(language)
+    skip: frozenset[str] = frozenset()
+    reused: dict[str, str] = {}
+    versions = []
+    with _timed(timings, 'render'):
+        for version in versions_to_apply:
+            version_vars = _version_vars(language, name, version)
+            rendered = _render_version(
+                name=name,
+                language=language,
+                version=version,
+                skip=skip,
+                hooks=hooks,
+                **version_vars,
+                **fmt_vars,
+            )
+            files = {
+                filename: _blob_hash(contents)
+                for filename, contents in rendered.items()
+            }
+            if skip:
+                _count(saved, hashes=len(skip))
+            else:
+                reused = {k: v for k, v in files.items() if k in invariant}
+                skip = invariant
+            files.update(reused)
+
+            versions.append({
+                'version': version,
+                'additional_dependencies': json.loads(
+                    version_vars['additional_dependencies'],
+                ),
+                'files': dict(sorted(files.items())),
+            })
+
+    return {
+        'repo': repo,
+        'language': language,
+        'name': name,
+        'previous_version': previous_version,
+        'versions': versions,
+    }
+
+
+def make_repo(
+        repo: str, *,
+        language: str,
+        name: str,
+        bulk: bool = False,
+        package_versions: Sequence[str] | None = None,
+        version_filter: VersionFilter = VersionFilter(),
+        hooks: Sequence[Mapping[str, str]] = (),
+        timings: dict[str, float] | None = None,
+        saved: dict[str, int] | None = None,
+        checkpoint: int | None = None,
+        **fmt_vars: str,
+) -> None:
+    """Commit and tag the upstream versions which are not mirrored yet.
+
+    `package_versions` (listed from the registry when not given) are
+    narrowed down by `version_filter` first.  When they were listed already,
+    they must have been listed without yanked versions for `skip_yanked`.
+
+    `hooks` are more hooks (`id`, `entry`, `args`, ...) for the same
+    package, they end up next to the first one in `.pre-commit-hooks.yaml`.
+
+    Files which do not depend on the version are only written for the first
+    of them, `saved` counts the file writes and hashes this avoided.
+
+    With `checkpoint`, the planned versions are journaled in the git
+    directory and progress is recorded every `checkpoint` versions.  A run
+    interrupted part way is then picked up by the next one from its last
+    commit, without listing the versions again.
+    """
+    versions_to_apply = None
+    if checkpoint is not None:
+        journal_path = journal.path(repo)
+        versions_to_apply = _resume(
+            repo,
+            journal_path,
+            language=language,
+            name=name,
+            timings=timings,
+        )
 
+    if versions_to_apply is None:
+        _, versions_to_apply = _versions_to_apply(
+            repo,
+            language=language,
+            name=name,
+            package_versions=package_versions,
+            version_filter=version_filter,
+            timings=timings,
+        )
+
+    def _progress(committed: int) -> None:
+        if checkpoint is not None:
+            journal.write(
+                journal_path,
+                {
+                    'language': language,
+                    'name': name,
+                    'versions': versions_to_apply,
+                    'committed': committed,
+                },
+            )
+
+    _progress(0)
+
+    if bulk and versions_to_apply:
+        # the first commit goes through the worktree: there may not be a
+        # commit to build on yet and `hooks.yaml` may need removing
+        first, *rest = versions_to_apply
         _commit_version(
             repo,
             name=name,
             language=language,
-            version=version,
-            additional_dependencies=json.dumps(additional_dependencies),
+            version=first,
+            skip=frozenset(),
+            hooks=hooks,
+            timings=timings,
+            saved=saved,
+            **_version_vars(language, name, first),
             **fmt_vars,
         )
+        if rest:
+            _fast_import_versions(
+                repo,
+                language=language,
+                name=name,
+                versions=rest,
+                hooks=hooks,
+                timings=timings,
+                saved=saved,
+                checkpoint=checkpoint,
+                on_checkpoint=lambda n: _progress(n + 1),
+                **fmt_vars,
+            )
+    else:
+        invariant = _invariant_files(language)
+        skip: frozenset[str] = frozenset()
+        for i, version in enumerate(versions_to_apply, 1):
+            _commit_version(
+                repo,
+                name=name,
+                language=language,
+                version=version,
+                skip=skip,
+                hooks=hooks,
+                timings=timings,
+                saved=saved,
+                **_version_vars(language, name, version),
+                **fmt_vars,
+            )
+            # nothing else writes to the worktree during the run
+            skip = invariant
+            if checkpoint is not None and i % checkpoint == 0:
+                _progress(i)
+
+    if checkpoint is not None:
+        journal.remove(journal_path)
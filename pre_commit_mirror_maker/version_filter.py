@@ -0,0 +1,74 @@
+"""Narrow down the upstream versions before anything is rendered.
+
+Every mirrored version costs a render and several git commands, so the
+pre-releases, old releases etc. which nobody wants are dropped right after
+listing.  The options are compiled once and the versions are checked in a
+single pass, each one parsed at most once.
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from packaging import specifiers
+from packaging import version
+
+
+class VersionFilter(NamedTuple):
+    specifier: specifiers.SpecifierSet | None = None
+    stable: bool = False
+    skip_yanked: bool = False
+    latest: int | None = None
+
+    @classmethod
+    def compile(
+            cls, *,
+            specifier: str = '',
+            stable: bool = False,
+            skip_yanked: bool = False,
+            latest: int | None = None,
+    ) -> VersionFilter:
+        """Raises `ValueError` for an invalid specifier or window."""
+        if latest is not None and latest < 1:
+            raise ValueError(f'latest must be at least 1, got {latest}')
+        if specifier:
+            specifier_set = specifiers.SpecifierSet(specifier)
+        else:
+            specifier_set = None
+        return cls(
+            specifier=specifier_set,
+            stable=stable,
+            skip_yanked=skip_yanked,
+            latest=latest,
+        )
+
+    def __call__(self, versions: Sequence[str]) -> list[str]:
+        """Filter `versions` (oldest first) keeping their order.
+
+        Yanked versions are left out by the listers (see `skip_yanked`).
+        """
+        if self.specifier is None and not self.stable:
+            ret = list(versions)
+        else:
+            ret = []
+            for s in versions:
+                try:
+                    v = version.Version(s)
+                except version.InvalidVersion:
+                    # not PEP 440 (`1.0.0-next.1`): cannot be compared or
+                    # told apart from a pre-release
+                    continue
+
+                if self.stable and v.is_prerelease:
+                    continue
+                # pre-releases are `stable`'s business
+                elif (
+                        self.specifier is not None and
+                        not self.specifier.contains(v, prereleases=True)
+                ):
+                    continue
+                ret.append(s)
+
+        if self.latest is not None:
+            ret = ret[-self.latest:]
+        return ret
@@ -0,0 +1,55 @@
+"""Keep the sorted order of a package's versions between runs.
+
+Sorting thousands of versions with `packaging.version.parse` on every run
+is wasted work when at most a handful are new.  The previous order is
+stored next to the http cache and only new versions are parsed and
+inserted.
+"""
+from __future__ import annotations
+
+import bisect
+import os
+import time
+from collections.abc import Collection
+
+from packaging import version
+
+from pre_commit_mirror_maker import http_cache
+
+
+def sort_versions(
+        language: str,
+        package_name: str,
+        versions: Collection[str],
+        *,
+        cache: http_cache.Cache | None = None,
+) -> list[str]:
+    """Return `versions` sorted by `packaging.version.parse`."""
+    if cache is None:
+        cache = http_cache.Cache.from_env()
+    path = http_cache.entry_path(cache, f'order\n{language}\n{package_name}')
+    entry = http_cache.read_entry(path)
+
+    if entry is None:
+        ordered = sorted(versions, key=version.parse)
+    else:
+        ordered = entry['versions']
+        current = set(versions)
+        previous = set(ordered)
+        if current == previous:
+            os.utime(path)
+            return ordered
+        if not current >= previous:
+            # versions removed upstream
+            ordered = [v for v in ordered if v in current]
+        for v in current - previous:
+            bisect.insort(ordered, v, key=version.parse)
+
+    entry = {
+        'language': language,
+        'package_name': package_name,
+        'fetched': time.time(),
+        'versions': ordered,
+    }
+    http_cache.write_entry(cache, path, entry)
+    return ordered
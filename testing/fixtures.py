@@ -0,0 +1,174 @@
+"""Generate registry responses shaped like the real thing.
+
+The documents carry the same per-release metadata as pypi.org / crates.io
+responses so parsing them costs about as much, without checking megabytes
+of recordings into the repository.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+
+
+def versions(n: int) -> list[str]:
+    return [f'{i // 100}.{i // 10 % 10}.{i % 10}' for i in range(n)]
+
+
+def _digest(s: str) -> str:
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+def pypi_json(n: int, *, files: int = 4) -> bytes:
+    releases = {}
+    for v in versions(n):
+        release = []
+        for i in range(files):
+            filename = f'pkg-{v}-py3-none-any-{i}.whl'
+            release.append({
+                'comment_text': '',
+                'digests': {
+                    'blake2b_256': _digest(f'b{filename}'),
+                    'md5': _digest(f'm{filename}')[:32],
+                    'sha256': _digest(filename),
+                },
+                'downloads': -1,
+                'filename': filename,
+                'has_sig': False,
+                'md5_digest': _digest(f'm{filename}')[:32],
+                'packagetype': 'bdist_wheel',
+                'python_version': 'py3',
+                'requires_python': '>=3.10',
+                'size': 123456 + i,
+                'upload_time': '2024-01-01T00:00:00',
+                'upload_time_iso_8601': '2024-01-01T00:00:00.000000Z',
+                'url': f'https://files.pythonhosted.org/packages/{filename}',
+                'yanked': v.endswith('.3'),
+                'yanked_reason': 'broken' if v.endswith('.3') else None,
+            })
+        releases[v] = release
+    doc = {
+        'info': {'name': 'pkg', 'description': 'a description\n' * 500},
+        'last_serial': 123456789,
+        'releases': releases,
+        'urls': releases[versions(n)[-1]] if n else [],
+        'vulnerabilities': [],
+    }
+    return json.dumps(doc).encode()
+
+
+def crates_json(n: int) -> bytes:
+    doc = {
+        'categories': [],
+        'crate': {'id': 'pkg', 'name': 'pkg', 'max_version': versions(n)[-1]},
+        'keywords': [],
+        'versions': [
+            {
+                'audit_actions': [],
+                'bin_names': ['pkg'],
+                'checksum': _digest(v),
+                'crate': 'pkg',
+                'crate_size': 123456,
+                'created_at': '2024-01-01T00:00:00.000000+00:00',
+                'dl_path': f'/api/v1/crates/pkg/{v}/download',
+                'downloads': 1234,
+                'features': {'default': ['std'], 'std': [], 'serde': ['dep']},
+                'id': i,
+                'license': 'MIT OR Apache-2.0',
+                'links': {
+                    'dependencies': f'/api/v1/crates/pkg/{v}/dependencies',
+                    'version_downloads': f'/api/v1/crates/pkg/{v}/downloads',
+                },
+                'num': v,
+                'published_by': {'id': 1, 'login': 'someone', 'name': None},
+                'readme_path': f'/api/v1/crates/pkg/{v}/readme',
+                'rust_version': '1.70',
+                'updated_at': '2024-01-01T00:00:00.000000+00:00',
+                'yanked': v.endswith('.3'),
+            }
+            for i, v in reversed(tuple(enumerate(versions(n))))
+        ],
+    }
+    return json.dumps(doc).encode()
+
+
+def rubygems_json(n: int) -> bytes:
+    doc = [
+        {
+            'authors': 'someone',
+            'built_at': '2024-01-01T00:00:00.000Z',
+            'created_at': '2024-01-01T00:00:00.000Z',
+            'description': 'a description\n' * 10,
+            'downloads_count': 1234,
+            'metadata': {'source_code_uri': 'https://example.com/pkg'},
+            'number': v,
+            'summary': 'a summary',
+            'platform': 'ruby',
+            'rubygems_version': '>= 0',
+            'ruby_version': '>= 3.0',
+            'prerelease': False,
+            'licenses': ['MIT'],
+            'requirements': [],
+            'sha': _digest(v),
+        }
+        for v in reversed(versions(n))
+    ]
+    return json.dumps(doc).encode()
+
+
+def npm_json(n: int) -> bytes:
+    """The abbreviated ("corgi") metadata document."""
+    doc = {
+        'name': 'pkg',
+        'modified': '2024-01-01T00:00:00.000Z',
+        'dist-tags': {'latest': versions(n)[-1]},
+        'versions': {
+            v: {
+                'name': 'pkg',
+                'version': v,
+                'dependencies': {'dep-a': '^1.0.0', 'dep-b': '^2.0.0'},
+                'bin': {'pkg': 'bin/pkg.js'},
+                'engines': {'node': '>=18'},
+                'dist': {
+                    'integrity': f'sha512-{_digest(f"i{v}")}',
+                    'shasum': _digest(v)[:40],
+                    'tarball': f'https://registry.npmjs.org/pkg/-/pkg-{v}.tgz',
+                    'fileCount': 42,
+                    'unpackedSize': 123456,
+                },
+            }
+            for v in versions(n)
+        },
+    }
+    return json.dumps(doc).encode()
+
+
+def simple_json(n: int, *, files: int = 4) -> bytes:
+    """A PEP 691 / PEP 700 project page."""
+    doc = {
+        'meta': {'api-version': '1.1'},
+        'name': 'pkg',
+        'versions': versions(n),
+        'files': [
+            {
+                'filename': filename,
+                'url': f'https://files.pythonhosted.org/packages/{filename}',
+                'hashes': {'sha256': _digest(filename)},
+                'requires-python': '>=3.10',
+                'core-metadata': {'sha256': _digest(f'm{filename}')},
+                'size': 123456 + i,
+                'upload-time': '2024-01-01T00:00:00.000000Z',
+                'yanked': v.endswith('.3'),
+            }
+            for v in versions(n)
+            for i, filename in enumerate(
+                [f'pkg-{v}.tar.gz'] +
+                # distinct wheels by build number
+                [f'pkg-{v}-{b}-py3-none-any.whl' for b in range(1, files)],
+            )
+        ],
+    }
+    return json.dumps(doc).encode()
+
+
+def goproxy_list(n: int) -> bytes:
+    return ''.join(f'v{v}\n' for v in versions(n)).encode()
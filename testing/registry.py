@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import contextlib
+import http.server
+import threading
+from collections.abc import Generator
+from typing import NamedTuple
+
+
+class Route(NamedTuple):
+    body: bytes
+    status: int = 200
+    headers: tuple[tuple[str, str], ...] = ()
+
+
+class Registry:
+    """A local stand-in for a package registry.
+
+    Register responses with `add` and inspect what was asked for through
+    `requests`, a list of `(path, headers)`.  `connections` counts the tcp
+    connections which were made.
+    """
+
+    def __init__(self) -> None:
+        self.url = ''
+        self.routes: dict[str, Route] = {}
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.connections = 0
+
+    def add(
+            self,
+            path: str,
+            body: bytes | str,
+            *,
+            status: int = 200,
+            headers: tuple[tuple[str, str], ...] = (),
+    ) -> None:
+        if isinstance(body, str):
+            body = body.encode()
+        self.routes[path] = Route(body, status, headers)
+
+    def paths(self) -> list[str]:
+        return [path for path, _ in self.requests]
+
+
+def _handler(registry: Registry) -> type[http.server.BaseHTTPRequestHandler]:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self) -> None:
+            super().setup()
+            registry.connections += 1
+
+        def do_GET(self) -> None:
+            registry.requests.append((self.path, dict(self.headers)))
+            route = registry.routes.get(self.path)
+            if route is None:
+                route = Route(b'not found', status=404)
+
+            headers = dict(route.headers)
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            if (
+                    (etag and self.headers['If-None-Match'] == etag) or (
+                        last_modified and
+                        self.headers['If-Modified-Since'] == last_modified
+                    )
+            ):
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(route.status)
+            for k, v in route.headers:
+                self.send_header(k, v)
+            self.send_header('Content-Length', str(len(route.body)))
+            self.end_headers()
+            self.wfile.write(route.body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    return Handler
+
+
+@contextlib.contextmanager
+def serve() -> Generator[Registry]:
+    registry = Registry()
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), _handler(registry),
+    )
+    registry.url = f'http://127.0.0.1:{server.server_port}'
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': .01},
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield registry
+    finally:
+        server.shutdown()
+        server.server_close()
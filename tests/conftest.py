@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pytest
+
+from pre_commit_mirror_maker import http_cache
+from testing.registry import serve
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmpdir, monkeypatch):
+    ret = tmpdir.join('cache')
+    monkeypatch.setenv('PRE_COMMIT_MIRROR_MAKER_CACHE_DIR', str(ret))
+    monkeypatch.delenv('PRE_COMMIT_MIRROR_MAKER_CACHE_TTL', raising=False)
+    monkeypatch.delenv('PRE_COMMIT_MIRROR_MAKER_CACHE_MAX_SIZE', raising=False)
+    monkeypatch.delenv('PRE_COMMIT_MIRROR_MAKER_CACHE_STALE', raising=False)
+    yield ret
+
+
+@pytest.fixture
+def registry():
+    with serve() as registry:
+        yield registry
+    http_cache.POOL.close()
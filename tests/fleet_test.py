@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import re
+import subprocess
+from typing import Any
+from unittest import mock
+
+import pytest
+
+from pre_commit_mirror_maker import fleet
+from pre_commit_mirror_maker.languages import LIST_VERSIONS
+
+
+def _git_init(path):
+    subprocess.check_call(('git', 'init', '-q', str(path)))
+
+
+def _tags(path):
+    cmd = ('git', '-C', str(path), 'tag', '-l')
+    return subprocess.check_output(cmd).decode().split()
+
+
+@pytest.fixture
+def fake_versions():
+    calls = []
+
+    def _ruby(name, *, yanked):
+        calls.append(('ruby', name))
+        if name == 'broken':
+            raise OSError('registry is down')
+        return ['1.0.0', '1.1.0']
+
+    def _python(name, *, yanked):
+        calls.append(('python', name))
+        return ['2.0.0']
+
+    fns = {'ruby': _ruby, 'python': _python}
+    with mock.patch.dict(LIST_VERSIONS, fns):
+        yield calls
+
+
+def test_mirror_argv():
+    argv = fleet.mirror_argv({
+        'repo_path': 'mirrors-yapf',
+        'language': 'python',
+        'package_name': 'yapf',
+        'args': '-i',
+        'types-or': ['python', 'pyi'],
+        'require_serial': True,
+        'bulk': False,
+    })
+    assert argv == [
+        'mirrors-yapf',
+        '--language=python',
+        '--package-name=yapf',
+        '--args=-i',
+        '--types-or=python',
+        '--types-or=pyi',
+        '--require-serial',
+    ]
+
+
+def test_mirror_argv_hooks():
+    argv = fleet.mirror_argv({
+        'repo_path': 'mirrors-ruff',
+        'language': 'python',
+        'package_name': 'ruff',
+        'types': 'python',
+        'hooks': [
+            {'id': 'ruff-format', 'entry': 'ruff format', 'types': 'python'},
+        ],
+        'bulk': True,
+    })
+    assert argv == [
+        'mirrors-ruff',
+        '--language=python',
+        '--package-name=ruff',
+        '--types=python',
+        '--bulk',
+        '--hook',
+        '--id=ruff-format',
+        '--entry=ruff format',
+        '--types=python',
+    ]
+
+
+def test_load_manifest_json(tmpdir):
+    manifest = tmpdir.join('manifest.json')
+    manifest.write(json.dumps({'mirrors': [{'repo_path': 'a'}]}))
+    assert fleet.load_manifest(str(manifest)) == [{'repo_path': 'a'}]
+
+
+def test_load_manifest_yaml(tmpdir):
+    manifest = tmpdir.join('manifest.yaml')
+    manifest.write('mirrors:\n-   repo_path: a\n    bulk: true\n')
+    ret = fleet.load_manifest(str(manifest))
+    assert ret == [{'repo_path': 'a', 'bulk': True}]
+
+
+def test_run_isolates_failures(tmpdir, fake_versions):
+    for name in ('scss-lint', 'scss-lint-2', 'yapf', 'broken'):
+        _git_init(tmpdir.join(name))
+
+    manifest: list[dict[str, Any]] = [
+        {
+            'repo_path': 'scss-lint', 'language': 'ruby',
+            'package_name': 'scss-lint', 'files_regex': r'\.scss$',
+        },
+        {
+            'repo_path': 'scss-lint-2', 'language': 'ruby',
+            'package_name': 'scss-lint', 'files_regex': r'\.scss$',
+            'id': 'scss-lint-2',
+        },
+        {
+            'repo_path': 'yapf', 'language': 'python',
+            'package_name': 'yapf', 'types': 'python', 'bulk': True,
+        },
+        {
+            'repo_path': 'broken', 'language': 'ruby',
+            'package_name': 'broken', 'types': 'ruby',
+        },
+        # not a git repository
+        {
+            'repo_path': 'missing', 'language': 'python',
+            'package_name': 'yapf', 'types': 'python',
+        },
+        # missing --types / --files-regex
+        {'repo_path': 'invalid', 'language': 'ruby', 'package_name': 'x'},
+    ]
+    results = fleet.run(manifest, root=str(tmpdir), jobs=2, git_jobs=2)
+
+    assert results == {
+        str(tmpdir.join('scss-lint')): None,
+        str(tmpdir.join('scss-lint-2')): None,
+        str(tmpdir.join('yapf')): None,
+        str(tmpdir.join('broken')): (
+            'listing versions failed: OSError: registry is down'
+        ),
+        str(tmpdir.join('missing')): mock.ANY,
+        str(tmpdir.join('invalid')): 'invalid mirror: 2',
+    }
+    assert str(results[tmpdir.join('missing')]).startswith('AssertionError')
+
+    # each package is only listed once
+    assert sorted(fake_versions) == [
+        ('python', 'yapf'), ('ruby', 'broken'), ('ruby', 'scss-lint'),
+    ]
+    assert _tags(tmpdir.join('scss-lint')) == ['v1.0.0', 'v1.1.0']
+    assert _tags(tmpdir.join('scss-lint-2')) == ['v1.0.0', 'v1.1.0']
+    assert _tags(tmpdir.join('yapf')) == ['v2.0.0']
+    assert _tags(tmpdir.join('broken')) == []
+
+
+def test_run_version_filters(tmpdir):
+    calls = []
+
+    def _ruby(name, *, yanked):
+        calls.append(yanked)
+        return ['1.0.0', '1.1.0rc1'] if yanked else ['1.1.0rc1']
+
+    for name in ('all', 'filtered'):
+        _git_init(tmpdir.join(name))
+    manifest: list[dict[str, Any]] = [
+        {
+            'repo_path': 'all', 'language': 'ruby',
+            'package_name': 'scss-lint', 'types': 'scss',
+        },
+        {
+            'repo_path': 'filtered', 'language': 'ruby',
+            'package_name': 'scss-lint', 'types': 'scss',
+            'skip_yanked': True, 'stable_only': True,
+        },
+    ]
+    with mock.patch.dict(LIST_VERSIONS, {'ruby': _ruby}):
+        results = fleet.run(manifest, root=str(tmpdir))
+
+    assert set(results.values()) == {None}
+    # listed once with and once without yanked versions
+    assert sorted(calls) == [False, True]
+    assert _tags(tmpdir.join('all')) == ['v1.0.0', 'v1.1.0rc1']
+    assert _tags(tmpdir.join('filtered')) == []
+
+
+def test_main(tmpdir, fake_versions, capsys):
+    _git_init(tmpdir.join('scss-lint'))
+    manifest = tmpdir.join('manifest.json')
+    manifest.write(
+        json.dumps({
+            'mirrors': [
+                {
+                    'repo_path': 'scss-lint', 'language': 'ruby',
+                    'package_name': 'scss-lint', 'types': 'scss',
+                },
+                {
+                    'repo_path': 'broken', 'language': 'ruby',
+                    'package_name': 'broken', 'types': 'ruby',
+                },
+            ],
+        }),
+    )
+
+    assert fleet.main((str(manifest), '--timings')) == 1
+
+    out, _ = capsys.readouterr()
+    assert re.search(r': ok\n    list=\d+\.\d{3}s filter=', out)
+    assert f'{tmpdir.join("scss-lint")}: ok\n' in out
+    assert f'{tmpdir.join("broken")}: FAILED\n' in out
+    assert '    listing versions failed: OSError: registry is down\n' in out
+    assert out.endswith('1 updated, 1 failed\n')
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import urllib.error
+from unittest import mock
+
+import pytest
+
+from pre_commit_mirror_maker import http_cache
+
+
+def _parse(resp):
+    return json.load(resp)
+
+
+def test_cache_from_env(cache_dir, monkeypatch):
+    monkeypatch.setenv('PRE_COMMIT_MIRROR_MAKER_CACHE_TTL', '60')
+    monkeypatch.setenv('PRE_COMMIT_MIRROR_MAKER_CACHE_MAX_SIZE', '1024')
+    monkeypatch.setenv('PRE_COMMIT_MIRROR_MAKER_CACHE_STALE', '600')
+    cache = http_cache.Cache.from_env()
+    assert cache == http_cache.Cache(
+        str(cache_dir), ttl=60, max_size=1024, stale=600,
+    )
+
+
+def test_cache_default_directory(monkeypatch):
+    monkeypatch.delenv('PRE_COMMIT_MIRROR_MAKER_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', '/tmp/xdg')
+    expected = os.path.join('/tmp/xdg', 'pre-commit-mirror-maker')
+    assert http_cache.Cache.from_env().directory == expected
+
+
+def test_get_uncached(registry):
+    registry.add('/pkg', '[1, 2]')
+    assert http_cache.get(f'{registry.url}/pkg', _parse) == [1, 2]
+    assert registry.paths() == ['/pkg']
+
+
+def test_get_revalidates_with_etag(registry):
+    registry.add('/pkg', '[1, 2]', headers=(('ETag', '"abc"'),))
+    url = f'{registry.url}/pkg'
+    assert http_cache.get(url, _parse) == [1, 2]
+    # content changes but the etag still matches: cached value is used
+    registry.add('/pkg', '[1, 2, 3]', headers=(('ETag', '"abc"'),))
+    assert http_cache.get(url, _parse) == [1, 2]
+
+    (_, first), (_, second) = registry.requests
+    assert 'If-None-Match' not in first
+    assert second['If-None-Match'] == '"abc"'
+
+    registry.add('/pkg', '[1, 2, 3]', headers=(('ETag', '"def"'),))
+    assert http_cache.get(url, _parse) == [1, 2, 3]
+
+
+def test_get_revalidates_with_last_modified(registry):
+    last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+    registry.add('/pkg', '[1]', headers=(('Last-Modified', last_modified),))
+    url = f'{registry.url}/pkg'
+    assert http_cache.get(url, _parse) == [1]
+    assert http_cache.get(url, _parse) == [1]
+    _, headers = registry.requests[-1]
+    assert headers['If-Modified-Since'] == last_modified
+
+
+def test_get_within_ttl_makes_no_request(registry, cache_dir):
+    cache = http_cache.Cache(str(cache_dir), ttl=60)
+    registry.add('/pkg', '[1]')
+    url = f'{registry.url}/pkg'
+    assert http_cache.get(url, _parse, cache=cache) == [1]
+    registry.add('/pkg', '[1, 2]')
+    assert http_cache.get(url, _parse, cache=cache) == [1]
+    assert registry.paths() == ['/pkg']
+
+
+def test_get_keyed_by_parser(registry):
+    def _parse_len(resp):
+        return len(json.load(resp))
+
+    registry.add('/pkg', '[1, 2]', headers=(('ETag', '"abc"'),))
+    url = f'{registry.url}/pkg'
+    assert http_cache.get(url, _parse) == [1, 2]
+    assert http_cache.get(url, _parse_len) == 2
+
+
+def test_get_errors_are_not_cached(registry):
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        http_cache.get(f'{registry.url}/missing', _parse)
+    assert excinfo.value.code == 404
+    with pytest.raises(urllib.error.HTTPError):
+        http_cache.get(f'{registry.url}/missing', _parse)
+    assert registry.paths() == ['/missing', '/missing']
+
+
+def test_get_evicts_least_recently_used(registry, cache_dir):
+    cache = http_cache.Cache(str(cache_dir), max_size=400)
+    for path in ('/a', '/b', '/c'):
+        registry.add(path, json.dumps('x' * 50))
+
+    http_cache.get(f'{registry.url}/a', _parse, cache=cache)
+    http_cache.get(f'{registry.url}/b', _parse, cache=cache)
+    assert len(cache_dir.listdir('*.json')) == 2
+
+    path = http_cache._path(cache, f'{registry.url}/a', _parse)
+    os.utime(path, (0, 0))
+    http_cache.get(f'{registry.url}/c', _parse, cache=cache)
+    assert not os.path.exists(path)
+    assert not os.path.exists(http_cache._lock_path(path))
+    assert len(cache_dir.listdir('*.json')) == 2
+
+
+def test_get_reuses_a_concurrent_fetch(registry, cache_dir):
+    registry.add('/pkg', '[1]')
+    url = f'{registry.url}/pkg'
+    cache = http_cache.Cache(str(cache_dir))
+    path = http_cache._path(cache, url, _parse)
+    cache_dir.ensure_dir()
+
+    waiting = threading.Event()
+    try_lock = http_cache._try_lock
+
+    def _try_lock(fd, *, blocking):
+        waiting.set()
+        return try_lock(fd, blocking=blocking)
+
+    with (
+            concurrent.futures.ThreadPoolExecutor(1) as executor,
+            http_cache._lock(http_cache._lock_path(path)),
+            mock.patch.object(http_cache, '_try_lock', _try_lock),
+    ):
+        future = executor.submit(http_cache.get, url, _parse, cache=cache)
+        waiting.wait()
+        # as if another run got there first
+        entry = {
+            'url': url, 'etag': None, 'last_modified': None,
+            'fetched': 2 ** 40, 'value': [1],
+        }
+        http_cache.write_entry(cache, path, entry)
+
+    assert future.result() == [1]
+    assert registry.paths() == []
+
+
+def test_get_stale_while_revalidating(registry, cache_dir):
+    cache = http_cache.Cache(str(cache_dir), stale=60)
+    registry.add('/pkg', '[1]')
+    url = f'{registry.url}/pkg'
+    assert http_cache.get(url, _parse, cache=cache) == [1]
+    registry.add('/pkg', '[1, 2]')
+
+    # another run is revalidating: the stale value is used without waiting
+    path = http_cache._path(cache, url, _parse)
+    with http_cache._lock(http_cache._lock_path(path)):
+        assert http_cache.get(url, _parse, cache=cache) == [1]
+    assert registry.paths() == ['/pkg']
+
+    assert http_cache.get(url, _parse, cache=cache) == [1, 2]
+    assert registry.paths() == ['/pkg', '/pkg']
+
+
+def test_get_past_stale_window_waits(registry, cache_dir):
+    cache = http_cache.Cache(str(cache_dir), stale=60)
+    registry.add('/pkg', '[1]')
+    url = f'{registry.url}/pkg'
+    path = http_cache._path(cache, url, _parse)
+    assert http_cache.get(url, _parse, cache=cache) == [1]
+    entry = http_cache.read_entry(path)
+    assert entry is not None
+    http_cache.write_entry(cache, path, {**entry, 'fetched': 0})
+
+    registry.add('/pkg', '[1, 2]')
+    assert http_cache.get(url, _parse, cache=cache) == [1, 2]
+
+
+def test_read_entry_remembers_unchanged_files(cache_dir):
+    cache = http_cache.Cache(str(cache_dir))
+    path = http_cache.entry_path(cache, 'k')
+    http_cache.write_entry(cache, path, {'value': [1]})
+
+    with mock.patch.object(json, 'load') as mck:
+        assert http_cache.read_entry(path) == {'value': [1]}
+    assert not mck.called
+
+    with open(path, 'w') as f:
+        f.write('{"value": [1, 2]}')
+    assert http_cache.read_entry(path) == {'value': [1, 2]}
+
+
+def test_pool_reuses_connections(registry):
+    registry.add('/a', '[1]')
+    registry.add('/b', '[2]')
+    assert http_cache.get(f'{registry.url}/a', _parse) == [1]
+    assert http_cache.get(f'{registry.url}/b', _parse) == [2]
+    assert registry.connections == 1
+    _, headers = registry.requests[0]
+    assert headers['User-Agent'] == http_cache.USER_AGENT
+
+
+def test_pool_does_not_reuse_closed_connections(registry):
+    registry.add('/a', '[1]', headers=(('Connection', 'close'),))
+    assert http_cache.get(f'{registry.url}/a', _parse) == [1]
+    assert http_cache.get(f'{registry.url}/a', _parse) == [1]
+    assert registry.connections == 2
+
+
+def test_pool_reconnects_after_close(registry):
+    registry.add('/a', '[1]')
+    assert http_cache.get(f'{registry.url}/a', _parse) == [1]
+    http_cache.POOL.close()
+    assert http_cache.get(f'{registry.url}/a', _parse) == [1]
+    assert registry.connections == 2
+
+
+def test_pool_follows_redirects(registry):
+    registry.add('/Old', '', status=301, headers=(('Location', '/new'),))
+    registry.add('/new', '[1]')
+    assert http_cache.get(f'{registry.url}/Old', _parse) == [1]
+    assert registry.paths() == ['/Old', '/new']
+
+
+def test_pool_too_many_redirects(registry):
+    registry.add('/loop', '', status=302, headers=(('Location', '/loop'),))
+    with pytest.raises(OSError) as excinfo:
+        http_cache.get(f'{registry.url}/loop', _parse)
+    assert str(excinfo.value).endswith('too many redirects')
+
+
+def test_get_async_shares_connections(registry):
+    for i in range(10):
+        registry.add(f'/{i}', json.dumps([i]))
+
+    async def _main():
+        ret = []
+        for i in range(10):
+            url = f'{registry.url}/{i}'
+            ret.append(await http_cache.get_async(url, _parse))
+        return ret
+
+    assert asyncio.run(_main()) == [[i] for i in range(10)]
+    assert registry.connections == 1
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os.path
+import subprocess
+
+from pre_commit_mirror_maker import journal
+
+
+def test_path_is_in_git_dir(tmpdir):
+    subprocess.check_call(('git', 'init', '-q', tmpdir))
+    expected = tmpdir.join('.git', journal.FILENAME)
+    assert journal.path(str(tmpdir)) == str(expected)
+
+
+def test_read_missing(tmpdir):
+    filename = tmpdir.join('journal.json')
+    assert journal.read(filename, language='ruby', name='pkg') is None
+
+
+def test_read_invalid(tmpdir):
+    filename = tmpdir.join('journal.json')
+    filename.write('{')
+    assert journal.read(filename, language='ruby', name='pkg') is None
+
+
+def test_write_read_roundtrip(tmpdir):
+    filename = str(tmpdir.join('journal.json'))
+    entry = {
+        'language': 'ruby', 'name': 'pkg',
+        'versions': ['1.0', '1.1'], 'committed': 0,
+    }
+    journal.write(filename, entry)
+    ret = journal.read(filename, language='ruby', name='pkg')
+    assert ret == ['1.0', '1.1']
+    # no temporary files left over
+    assert os.listdir(tmpdir) == ['journal.json']
+
+
+def test_read_other_package(tmpdir):
+    filename = str(tmpdir.join('journal.json'))
+    entry = {'language': 'ruby', 'name': 'pkg', 'versions': ['1.0']}
+    journal.write(filename, entry)
+    assert journal.read(filename, language='ruby', name='other') is None
+    assert journal.read(filename, language='node', name='pkg') is None
+
+
+def test_remove(tmpdir):
+    filename = str(tmpdir.join('journal.json'))
+    journal.write(filename, {})
+    journal.remove(filename)
+    assert not os.path.exists(filename)
+    # already gone is fine
+    journal.remove(filename)
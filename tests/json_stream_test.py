@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from pre_commit_mirror_maker import json_stream
+
+DOC = {
+    'info': {'name': 'pkg', 'description': 'snowman: ☃ ' * 20},
+    'last_serial': 1234567890,
+    'releases': {
+        '0.1': [{'filename': 'pkg-0.1.tar.gz', 'yanked': False}],
+        '0.2': [],
+        '1.0☃': [{'size': 12345, 'digests': {'sha256': 'ab' * 32}}],
+    },
+    'urls': [],
+    'versions': [{'num': '1.0', 'n': 10}, {'num': '0.1', 'n': 1.5e3}],
+    'number': 123456789,
+}
+
+
+def _fp(doc, **kwargs):
+    return io.BytesIO(json.dumps(doc, **kwargs).encode())
+
+
+@pytest.mark.parametrize('chunk_size', (1, 3, 7, 64, json_stream.CHUNK_SIZE))
+@pytest.mark.parametrize('indent', (None, 4))
+def test_object_items(chunk_size, indent):
+    fp = _fp(DOC, indent=indent, ensure_ascii=False)
+    ret = dict(json_stream.object_items(fp, 'releases', chunk_size=chunk_size))
+    assert ret == DOC['releases']
+
+
+@pytest.mark.parametrize('chunk_size', (1, 3, 7, 64))
+def test_array_items(chunk_size):
+    fp = _fp(DOC, ensure_ascii=False)
+    ret = list(json_stream.array_items(fp, 'versions', chunk_size=chunk_size))
+    assert ret == DOC['versions']
+
+
+def test_stops_reading_after_the_member():
+    fp = io.BytesIO(b'{"releases": {"1": []}, "urls": [garbage')
+    assert list(json_stream.object_items(fp, 'releases')) == [('1', [])]
+
+
+def test_empty_containers():
+    fp = io.BytesIO(b'{"releases": {}, "versions": []}')
+    assert list(json_stream.object_items(fp, 'releases')) == []
+    fp = io.BytesIO(b'{"versions" : [ ] }')
+    assert list(json_stream.array_items(fp, 'versions')) == []
+
+
+def test_missing_key():
+    with pytest.raises(KeyError):
+        list(json_stream.object_items(io.BytesIO(b'{"a": 1}'), 'releases'))
+
+
+@pytest.mark.parametrize(
+    's',
+    (
+        b'',
+        b'[]',
+        b'{"releases": []}',
+        b'{"releases": {"1": []',
+        b'{"releases": {"1": [] "2": []}}',
+        b'{"releases": {"1" []}}',
+    ),
+)
+def test_invalid(s):
+    with pytest.raises(json.JSONDecodeError):
+        list(json_stream.object_items(io.BytesIO(s), 'releases'))
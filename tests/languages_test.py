@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import io
+import json
+import os
+import urllib.error
+from unittest import mock
+
 import pytest
 
+from pre_commit_mirror_maker import languages
 from pre_commit_mirror_maker.languages import golang_get_package_versions
 from pre_commit_mirror_maker.languages import node_get_package_versions
 from pre_commit_mirror_maker.languages import python_get_package_versions
 from pre_commit_mirror_maker.languages import ruby_get_package_versions
 from pre_commit_mirror_maker.languages import rust_get_package_versions
+from testing import fixtures
 
 
 def assert_all_text(versions):
@@ -61,3 +70,355 @@ def test_golang_get_package_version_output(package_name):
 def test_golang_get_package_version_invalid_package():
     with pytest.raises(ValueError):
         golang_get_package_versions('mvdan.cc/foo')
+
+
+@pytest.fixture
+def local_registries(registry, monkeypatch):
+    monkeypatch.delenv('PIP_INDEX_URL', raising=False)
+    monkeypatch.delenv('GOPROXY', raising=False)
+    simple = f'{registry.url}/simple/'
+    with (
+            mock.patch.object(languages, 'RUBYGEMS', registry.url),
+            mock.patch.object(languages, 'PYPI_SIMPLE', simple),
+            mock.patch.object(languages, 'CRATES_IO', registry.url),
+            mock.patch.object(languages, 'GOPROXY', registry.url),
+    ):
+        yield registry
+
+
+def test_ruby_get_package_versions_local(local_registries):
+    resp = [{'number': '0.2.0'}, {'number': '0.1.0'}]
+    local_registries.add('/api/v1/versions/scss-lint.json', json.dumps(resp))
+    ret = ruby_get_package_versions('scss-lint')
+    assert ret == ['0.1.0', '0.2.0']
+
+
+def _simple_page(versions=None, filenames=()):
+    page = {
+        'meta': {'api-version': '1.1'},
+        'name': 'bandit',
+        'files': [{'filename': filename} for filename in filenames],
+    }
+    if versions is not None:
+        page['versions'] = versions
+    return json.dumps(page)
+
+
+def test_python_get_package_versions_local(local_registries):
+    resp = _simple_page(
+        versions=['0.10.0', '0.9.0', '1.0.0rc1'],
+        filenames=['bandit-0.9.0.tar.gz'],
+    )
+    local_registries.add('/simple/bandit/', resp)
+    ret = python_get_package_versions('bandit[yaml]')
+    assert ret == ['0.9.0', '0.10.0', '1.0.0rc1']
+    (_, headers), = local_registries.requests
+    assert headers['Accept'].startswith('application/vnd.pypi.simple.v1+json')
+
+
+def test_python_get_package_versions_normalizes_name(local_registries):
+    local_registries.add('/simple/flake8-plugin/', _simple_page(['1.0']))
+    assert python_get_package_versions('Flake8_Plugin') == ['1.0']
+
+
+def test_python_get_package_versions_from_filenames(local_registries):
+    resp = _simple_page(
+        filenames=[
+            'bandit-1.0.0-py3-none-any.whl',
+            'bandit-1.0.0.tar.gz',
+            'bandit-0.9.0.zip',
+            'bandit-0.10.0b1-py2.py3-none-any.whl',
+            'bandit-0.8.0-py2.7.egg',
+            'bandit-invalid.whl',
+        ],
+    )
+    local_registries.add('/simple/bandit/', resp)
+    ret = python_get_package_versions('bandit')
+    assert ret == ['0.9.0', '0.10.0b1', '1.0.0']
+
+
+def test_python_get_package_versions_html_index(local_registries):
+    resp = (
+        '<!DOCTYPE html>\n<html><body>\n'
+        '<a href="../../bandit-1.0.0.tar.gz#sha256=ab">bandit-1.0.0.tar.gz</a>'
+        '<br/>\n'
+        '<a href="../../bandit-0.9.0-py3-none-any.whl" data-yanked="">'
+        'bandit-0.9.0-py3-none-any.whl</a><br/>\n'
+        '</body></html>\n'
+    )
+    local_registries.add('/simple/bandit/', resp)
+    assert python_get_package_versions('bandit') == ['0.9.0', '1.0.0']
+
+
+def test_python_get_package_versions_index_url(
+        local_registries, monkeypatch,
+):
+    index_url = f'{local_registries.url}/root/pypi/+simple'
+    monkeypatch.setenv('PIP_INDEX_URL', index_url)
+    local_registries.add('/root/pypi/+simple/bandit/', _simple_page(['1.0']))
+    assert python_get_package_versions('bandit') == ['1.0']
+
+
+def test_rust_get_package_versions_local(local_registries):
+    resp = {'versions': [{'num': '0.2.0'}, {'num': '0.1.0'}]}
+    local_registries.add('/api/v1/crates/clap', json.dumps(resp))
+    assert rust_get_package_versions('clap') == ['0.1.0', '0.2.0']
+
+
+def test_golang_get_package_versions_local(local_registries):
+    local_registries.add('/mvdan.cc/sh/v3/@v/list', 'v3.10.0\nv3.9.0\n')
+    ret = golang_get_package_versions('mvdan.cc/sh/v3/cmd/shfmt')
+    assert ret == ['3.9.0', '3.10.0']
+    # every prefix is probed at once
+    assert sorted(local_registries.paths()) == [
+        '/mvdan.cc/@v/list',
+        '/mvdan.cc/sh/@v/list',
+        '/mvdan.cc/sh/v3/@v/list',
+        '/mvdan.cc/sh/v3/cmd/@v/list',
+        '/mvdan.cc/sh/v3/cmd/shfmt/@v/list',
+    ]
+
+    # the module path is remembered
+    local_registries.requests.clear()
+    ret = golang_get_package_versions('mvdan.cc/sh/v3/cmd/shfmt')
+    assert ret == ['3.9.0', '3.10.0']
+    assert local_registries.paths() == ['/mvdan.cc/sh/v3/@v/list']
+
+
+def test_golang_get_package_versions_prefers_longest(local_registries):
+    local_registries.add('/example.com/mod/@v/list', 'v1.0.0\n')
+    local_registries.add('/example.com/mod/sub/@v/list', 'v2.0.0\n')
+    ret = golang_get_package_versions('example.com/mod/sub/cmd')
+    assert ret == ['2.0.0']
+
+
+def test_golang_get_package_versions_module_moved(local_registries):
+    local_registries.add('/example.com/mod/@v/list', 'v1.0.0\n')
+    assert golang_get_package_versions('example.com/mod/sub') == ['1.0.0']
+    # sub became its own module
+    local_registries.add('/example.com/mod/sub/@v/list', 'v2.0.0\n')
+    assert golang_get_package_versions('example.com/mod/sub') == ['1.0.0']
+    del local_registries.routes['/example.com/mod/@v/list']
+    assert golang_get_package_versions('example.com/mod/sub') == ['2.0.0']
+
+
+def test_golang_get_package_versions_error(local_registries):
+    local_registries.add('/example.com/mod/sub/@v/list', 'oops', status=500)
+    local_registries.add('/example.com/mod/@v/list', 'v1.0.0\n')
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        golang_get_package_versions('example.com/mod/sub')
+    assert excinfo.value.code == 500
+
+
+def test_golang_get_package_versions_goproxy_not_found_fallback(
+        local_registries, monkeypatch,
+):
+    url = local_registries.url
+    monkeypatch.setenv('GOPROXY', f'{url}/a,direct,{url}/b/')
+    local_registries.add('/b/example.com/mod/@v/list', 'v1.0.0\n')
+    assert golang_get_package_versions('example.com/mod') == ['1.0.0']
+
+
+def test_golang_get_package_versions_goproxy_error_fallback(
+        local_registries, monkeypatch,
+):
+    url = local_registries.url
+    local_registries.add('/a/example.com/mod/@v/list', 'oops', status=500)
+    local_registries.add('/b/example.com/mod/@v/list', 'v1.0.0\n')
+
+    monkeypatch.setenv('GOPROXY', f'{url}/a,{url}/b')
+    with pytest.raises(urllib.error.HTTPError):
+        golang_get_package_versions('example.com/mod')
+
+    monkeypatch.setenv('GOPROXY', f'{url}/a|{url}/b')
+    assert golang_get_package_versions('example.com/mod') == ['1.0.0']
+
+
+def test_golang_get_package_versions_goproxy_off(
+        local_registries, monkeypatch,
+):
+    monkeypatch.setenv('GOPROXY', 'off')
+    with pytest.raises(ValueError) as excinfo:
+        golang_get_package_versions('example.com/mod')
+    msg, = excinfo.value.args
+    assert msg == 'Cannot find package name example.com/mod on GOPROXY'
+
+
+def test_golang_get_package_versions_escapes_capitals(local_registries):
+    local_registries.add('/github.com/!burnt!sushi/toml/@v/list', 'v1.0.0\n')
+    ret = golang_get_package_versions('github.com/BurntSushi/toml')
+    assert ret == ['1.0.0']
+
+
+def test_golang_get_package_versions_local_invalid(local_registries):
+    with pytest.raises(ValueError):
+        golang_get_package_versions('mvdan.cc/foo')
+
+
+def test_python_get_package_versions_revalidates(local_registries):
+    resp = _simple_page(['1.0.0'])
+    headers = (('ETag', '"v1"'),)
+    local_registries.add('/simple/flake8/', resp, headers=headers)
+    assert python_get_package_versions('flake8') == ['1.0.0']
+    assert python_get_package_versions('flake8') == ['1.0.0']
+    _, req_headers = local_registries.requests[-1]
+    assert req_headers['If-None-Match'] == '"v1"'
+
+
+def test_list_versions_async_concurrently(local_registries):
+    ruby_resp = json.dumps([{'number': '0.2.0'}, {'number': '0.1.0'}])
+    local_registries.add('/api/v1/versions/scss-lint.json', ruby_resp)
+    local_registries.add('/simple/flake8/', _simple_page(['1.0.0']))
+    local_registries.add('/mvdan.cc/gofumpt/@v/list', 'v0.1.0\n')
+
+    async def _main():
+        return await asyncio.gather(
+            languages.LIST_VERSIONS_ASYNC['ruby']('scss-lint'),
+            languages.LIST_VERSIONS_ASYNC['python']('flake8'),
+            languages.LIST_VERSIONS_ASYNC['golang']('mvdan.cc/gofumpt'),
+        )
+
+    assert asyncio.run(_main()) == [['0.1.0', '0.2.0'], ['1.0.0'], ['0.1.0']]
+
+
+@pytest.fixture
+def npm_registry(registry, tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    for k in tuple(os.environ):
+        if k.lower().startswith('npm_config_'):
+            monkeypatch.delenv(k)
+    monkeypatch.setenv('NPM_CONFIG_USERCONFIG', str(tmpdir.join('userrc')))
+    with mock.patch.object(languages, 'NPM_REGISTRY', f'{registry.url}/'):
+        yield registry
+
+
+def _packument(*versions):
+    return json.dumps({
+        'name': 'jshint',
+        'dist-tags': {'latest': versions[-1]},
+        'versions': {v: {'name': 'jshint', 'version': v} for v in versions},
+    })
+
+
+def test_node_get_package_versions_local(npm_registry):
+    npm_registry.add('/jshint', _packument('1.0.0', '0.9.0', '1.1.0'))
+    ret = node_get_package_versions('jshint')
+    # registry (publication) order, like `npm view --json`
+    assert ret == ['1.0.0', '0.9.0', '1.1.0']
+    (_, headers), = npm_registry.requests
+    assert headers['Accept'].startswith('application/vnd.npm.install-v1+json')
+    assert 'Authorization' not in headers
+
+
+def test_node_get_package_versions_scoped(npm_registry):
+    npm_registry.add('/@bugron%2fvalidate', _packument('1.0.0'))
+    ret = node_get_package_versions('@bugron/validate')
+    assert ret == ['1.0.0']
+
+
+def test_node_get_package_versions_npmrc_registry(
+        npm_registry, tmpdir, monkeypatch,
+):
+    monkeypatch.setenv('NPM_TOKEN', 'hunter2')
+    npm_registry.add('/private/jshint', _packument('2.0.0'))
+    nerf_dart = npm_registry.url.removeprefix('http:')
+    tmpdir.join('userrc').write(
+        f'; user config\n'
+        f'registry={npm_registry.url}/private/\n'
+        f'{nerf_dart}/private/:_authToken=${{NPM_TOKEN}}\n',
+    )
+    assert node_get_package_versions('jshint') == ['2.0.0']
+    (_, headers), = npm_registry.requests
+    assert headers['Authorization'] == 'Bearer hunter2'
+
+
+def test_node_get_package_versions_project_npmrc_scope(npm_registry, tmpdir):
+    npm_registry.add('/scoped/@org%2ftool', _packument('3.0.0'))
+    tmpdir.join('userrc').write('registry=https://example.invalid/\n')
+    tmpdir.join('.npmrc').write(
+        f'@org:registry={npm_registry.url}/scoped\n',
+    )
+    assert node_get_package_versions('@org/tool') == ['3.0.0']
+
+
+def test_node_get_package_versions_env_registry(npm_registry, tmpdir):
+    npm_registry.add('/env/jshint', _packument('4.0.0'))
+    tmpdir.join('.npmrc').write('registry=https://example.invalid/\n')
+    with mock.patch.dict(
+            os.environ, {'npm_config_registry': f'{npm_registry.url}/env'},
+    ):
+        assert node_get_package_versions('jshint') == ['4.0.0']
+
+
+def test_rust_releases_large_response():
+    body = fixtures.crates_json(250)
+    expected = [v['num'] for v in reversed(json.loads(body)['versions'])]
+    versions, yanked = languages._rust_releases(io.BytesIO(body))
+    assert versions == expected
+    assert sorted(yanked) == sorted(v for v in expected if v.endswith('.3'))
+
+
+def _first(func):
+    return lambda fp: func(fp)[0]
+
+
+@pytest.mark.parametrize(
+    ('func', 'make_body'),
+    (
+        (languages._golang_versions, fixtures.goproxy_list),
+        (languages._node_versions, fixtures.npm_json),
+        (_first(languages._python_releases), fixtures.simple_json),
+        (languages._ruby_versions, fixtures.rubygems_json),
+        (_first(languages._rust_releases), fixtures.crates_json),
+    ),
+)
+def test_fixtures_parse(func, make_body):
+    assert func(io.BytesIO(make_body(25))) == fixtures.versions(25)
+
+
+def test_python_get_package_versions_skip_yanked(local_registries):
+    page = {
+        'meta': {'api-version': '1.1'},
+        'name': 'bandit',
+        'versions': ['0.9.0', '1.0', '1.1.0'],
+        'files': [
+            {'filename': 'bandit-0.9.0.tar.gz', 'yanked': 'broken'},
+            {'filename': 'bandit-1.0.0.tar.gz', 'yanked': True},
+            {'filename': 'bandit-1.0.0-py3-none-any.whl', 'yanked': True},
+            # only partially yanked
+            {'filename': 'bandit-1.1.0.tar.gz', 'yanked': True},
+            {'filename': 'bandit-1.1.0-py3-none-any.whl', 'yanked': False},
+        ],
+    }
+    local_registries.add(
+        '/simple/bandit/', json.dumps(page), headers=(('ETag', '"1"'),),
+    )
+    ret = python_get_package_versions('bandit', yanked=False)
+    assert ret == ['1.1.0']
+    # both come from the same cache entry
+    assert python_get_package_versions('bandit') == ['0.9.0', '1.0', '1.1.0']
+    _, (_, headers) = local_registries.requests
+    assert headers['If-None-Match'] == '"1"'
+
+
+def test_python_get_package_versions_skip_yanked_html(local_registries):
+    resp = (
+        '<a href="../../bandit-1.0.0.tar.gz">bandit-1.0.0.tar.gz</a>\n'
+        '<a href="../../bandit-0.9.0.tar.gz" data-yanked="">'
+        'bandit-0.9.0.tar.gz</a>\n'
+    )
+    local_registries.add('/simple/bandit/', resp)
+    assert python_get_package_versions('bandit', yanked=False) == ['1.0.0']
+
+
+def test_rust_get_package_versions_skip_yanked(local_registries):
+    resp = {
+        'versions': [
+            {'num': '0.3.0', 'yanked': False},
+            {'num': '0.2.0', 'yanked': True},
+            {'num': '0.1.0', 'yanked': False},
+        ],
+    }
+    local_registries.add('/api/v1/crates/clap', json.dumps(resp))
+    ret = rust_get_package_versions('clap', yanked=False)
+    assert ret == ['0.1.0', '0.3.0']
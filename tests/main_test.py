@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import json
 from unittest import mock
 
 import pytest
 
 from pre_commit_mirror_maker import main
+from pre_commit_mirror_maker.version_filter import VersionFilter
 
 
 @pytest.fixture
@@ -40,10 +42,12 @@ def test_main_passes_args(mock_make_repo):
     ))
     mock_make_repo.assert_called_once_with(
         '.',
-        language='ruby', name='scss-lint', description='',
+        language='ruby', name='scss-lint', bulk=False, checkpoint=None,
+        description='',
         entry='scss-lint-entry',
         id='scss-lint-id', match_key='files', match_val=r'\.scss$', args='[]',
         require_serial='false', minimum_pre_commit_version='0',
+        version_filter=VersionFilter(), timings={}, saved={},
     )
 
 
@@ -68,6 +72,28 @@ def test_main_defaults_id_to_entry(mock_make_repo):
     assert mock_make_repo.call_args[1]['id'] == 'scss-lint'
 
 
+def test_main_bulk(mock_make_repo):
+    assert not main.main((
+        '.',
+        '--language', 'ruby',
+        '--package-name', 'scss-lint',
+        '--files-regex', r'\.scss$',
+        '--bulk',
+    ))
+    assert mock_make_repo.call_args[1]['bulk'] is True
+
+
+def test_main_checkpoint(mock_make_repo):
+    assert not main.main((
+        '.',
+        '--language', 'ruby',
+        '--package-name', 'scss-lint',
+        '--files-regex', r'\.scss$',
+        '--checkpoint', '100',
+    ))
+    assert mock_make_repo.call_args[1]['checkpoint'] == 100
+
+
 def test_main_with_args(mock_make_repo):
     assert not main.main((
         '.',
@@ -139,3 +165,143 @@ def test_main_errors_when_hook_id_has_spaces(mock_make_repo):
         'hook id should not contain spaces, perhaps specify --id?\n\n'
         '-   id: clang-format -i'
     )
+
+
+def test_main_hooks(mock_make_repo):
+    assert not main.main((
+        '.',
+        '--language', 'python',
+        '--package-name', 'ruff',
+        '--id', 'ruff', '--entry', 'ruff check', '--types-or=python',
+        '--hook', '--id', 'ruff-format', '--entry', 'ruff format',
+        '--types-or=python', '--types-or=pyi',
+        '--hook', '--id', 'ruff-fix', '--entry', 'ruff check',
+        '--types=python', '--args=--fix', '--require-serial',
+    ))
+    kwargs = mock_make_repo.call_args[1]
+    assert kwargs['id'] == 'ruff'
+    assert kwargs['hooks'] == [
+        {
+            'description': '', 'entry': 'ruff format', 'id': 'ruff-format',
+            'match_key': 'types_or', 'match_val': '[python, pyi]',
+            'args': '[]', 'require_serial': 'false',
+            'minimum_pre_commit_version': '2.9.2',
+        },
+        {
+            'description': '', 'entry': 'ruff check', 'id': 'ruff-fix',
+            'match_key': 'types', 'match_val': '[python]',
+            'args': '["--fix"]', 'require_serial': 'true',
+            'minimum_pre_commit_version': '0',
+        },
+    ]
+
+
+def test_main_hooks_need_unique_ids(mock_make_repo):
+    with pytest.raises(SystemExit) as excinfo:
+        main.main((
+            '.',
+            '--language', 'python',
+            '--package-name', 'ruff',
+            '--types=python',
+            '--hook', '--types=pyi',
+        ))
+    msg, = excinfo.value.args
+    assert msg.endswith('duplicated: ruff')
+
+
+def test_main_hooks_only_take_hook_options(mock_make_repo, capsys):
+    with pytest.raises(SystemExit):
+        main.main((
+            '.',
+            '--language', 'python',
+            '--package-name', 'ruff',
+            '--types=python',
+            '--hook', '--id', 'ruff-format', '--types=python', '--bulk',
+        ))
+    _, err = capsys.readouterr()
+    assert 'unrecognized arguments: --bulk' in err
+
+
+def test_main_version_filter(mock_make_repo):
+    assert not main.main((
+        '.',
+        '--language', 'python',
+        '--package-name', 'yapf',
+        '--types=python',
+        '--versions=>=0.20',
+        '--stable-only',
+        '--skip-yanked',
+        '--latest', '5',
+    ))
+    expected = VersionFilter.compile(
+        specifier='>=0.20', stable=True, skip_yanked=True, latest=5,
+    )
+    assert mock_make_repo.call_args[1]['version_filter'] == expected
+
+
+def test_main_invalid_versions(mock_make_repo):
+    with pytest.raises(SystemExit) as excinfo:
+        main.main((
+            '.',
+            '--language', 'python',
+            '--package-name', 'yapf',
+            '--types=python',
+            '--versions=lol',
+        ))
+    msg, = excinfo.value.args
+    assert msg.startswith('invalid --versions: ')
+
+
+def test_main_invalid_latest(mock_make_repo, capsys):
+    with pytest.raises(SystemExit):
+        main.main((
+            '.',
+            '--language', 'python',
+            '--package-name', 'yapf',
+            '--types=python',
+            '--latest=0',
+        ))
+    _, err = capsys.readouterr()
+    assert 'argument --latest: must be at least 1, got 0' in err
+
+
+def test_main_timings(mock_make_repo, capsys):
+    def _make_repo(*args, timings, saved, **kwargs):
+        timings['list'] = 1.5
+        timings['git commit'] = .25
+        saved.update(writes=4, hashes=4)
+
+    mock_make_repo.side_effect = _make_repo
+    assert not main.main((
+        '.',
+        '--language', 'python',
+        '--package-name', 'yapf',
+        '--types=python',
+        '--timings',
+    ))
+    _, err = capsys.readouterr()
+    assert err == (
+        'timings: list=1.500s git commit=0.250s\n'
+        'saved: writes=4 hashes=4\n'
+    )
+
+
+def test_main_plan(mock_make_repo, capsys):
+    plan = {'repo': '.', 'versions': []}
+    with mock.patch.object(main, 'plan_repo', return_value=plan) as mck:
+        assert not main.main((
+            '.',
+            '--language', 'python',
+            '--package-name', 'yapf',
+            '--types=python',
+            '--bulk',
+            '--checkpoint', '10',
+            '--plan',
+        ))
+    assert not mock_make_repo.called
+    assert 'bulk' not in mck.call_args[1]
+    assert 'checkpoint' not in mck.call_args[1]
+    out, _ = capsys.readouterr()
+    assert json.loads(out) == {
+        'repo': '.', 'versions': [], 'timings': {}, 'saved': {},
+    }
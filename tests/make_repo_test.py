@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import os.path
 import subprocess
 import sys
+from typing import Any
 from unittest import mock
 
 import pytest
 import yaml
 
+from pre_commit_mirror_maker import journal
 from pre_commit_mirror_maker.languages import LIST_VERSIONS
 from pre_commit_mirror_maker.make_repo import _commit_version
+from pre_commit_mirror_maker.make_repo import _invariant_files
+from pre_commit_mirror_maker.make_repo import _package_templates
 from pre_commit_mirror_maker.make_repo import format_files
 from pre_commit_mirror_maker.make_repo import make_repo
+from pre_commit_mirror_maker.make_repo import plan_repo
+from pre_commit_mirror_maker.make_repo import Template
+from pre_commit_mirror_maker.make_repo import versions_to_apply_after
+from pre_commit_mirror_maker.version_filter import VersionFilter
 
 
 def _cmd(*cmd):
@@ -32,6 +41,61 @@ def test_format_files(tmpdir):
     assert dest.join('file3.txt').read() == 'foo bar derp'
 
 
+@pytest.mark.parametrize(
+    's',
+    (
+        '',
+        'hello world',
+        '{foo} bar {baz}',
+        '{{"curly": "{foo}"}}',
+        'name: {foo!r}',
+        '[{foo:>6}] [{baz:{width}}]',
+    ),
+)
+def test_template_matches_str_format(s):
+    fmt_vars = {'foo': 'herp', 'baz': 'derp', 'width': '8'}
+    assert Template.parse(s).render(fmt_vars) == s.format(**fmt_vars)
+
+
+@pytest.mark.parametrize(
+    ('s', 'expected'),
+    (
+        ('hello world', set()),
+        ('{foo} bar {baz}', {'foo', 'baz'}),
+        ('{{not_a_field}} {foo!r}', {'foo'}),
+        ('{foo.bar} {baz[0]}', {'foo', 'baz'}),
+        ('[{foo:{width}}]', {'foo', 'width'}),
+    ),
+)
+def test_template_fields(s, expected):
+    assert Template.parse(s).fields == expected
+
+
+@pytest.mark.parametrize(
+    ('language', 'expected'),
+    (
+        ('ruby', {'LICENSE', '.pre-commit-hooks.yaml'}),
+        # additional_dependencies are pinned to the version
+        ('rust', {'LICENSE', 'Cargo.toml', 'main.rs'}),
+    ),
+)
+def test_invariant_files(language, expected):
+    assert _invariant_files(language) == expected
+
+
+def test_package_templates_loaded_once():
+    _package_templates.cache_clear()
+    with mock.patch.object(Template, 'parse', wraps=Template.parse) as mck:
+        first = _package_templates('rust')
+        second = _package_templates('rust')
+    assert first is second
+    assert set(first) == {
+        '.pre-commit-hooks.yaml', '.version', 'LICENSE', 'Cargo.toml',
+        'main.rs',
+    }
+    assert mck.call_count == len(first)
+
+
 def test_skips_directories(tmpdir):
     src = tmpdir.join('src').ensure_dir()
     dest = tmpdir.join('dest').ensure_dir()
@@ -121,9 +185,40 @@ def test_arguments_name_with_special_chars(in_git_dir):
     }]
 
 
+def test_commit_version_hooks(in_git_dir):
+    hook: dict[str, str] = {
+        'id': 'yapf-diff', 'entry': 'yapf', 'description': '',
+        'match_key': 'types', 'match_val': '[python]', 'args': '["--diff"]',
+        'require_serial': 'true', 'minimum_pre_commit_version': '0',
+    }
+    _commit_version(
+        '.',
+        version='0.6.2', language='python', name='yapf',
+        description='', entry='yapf', id='yapf',
+        match_key='files', match_val=r'\.py$', args='["-i"]',
+        additional_dependencies='[]', require_serial='false',
+        minimum_pre_commit_version='0', hooks=[hook],
+    )
+    contents = in_git_dir.join('.pre-commit-hooks.yaml').read()
+    first, second = yaml.safe_load(contents)
+    assert (first['id'], first['args']) == ('yapf', ['-i'])
+    assert second == {
+        'id': 'yapf-diff',
+        'name': 'yapf',
+        'description': '',
+        'entry': 'yapf',
+        'language': 'python',
+        'types': ['python'],
+        'args': ['--diff'],
+        'require_serial': True,
+        'additional_dependencies': [],
+        'minimum_pre_commit_version': '0',
+    }
+
+
 @pytest.fixture
 def fake_versions():
-    fns = {'ruby': lambda _: ('0.23.1', '0.24.0', '0.24.1')}
+    fns = {'ruby': lambda _, *, yanked: ('0.23.1', '0.24.0', '0.24.1')}
     with mock.patch.dict(LIST_VERSIONS, fns):
         yield
 
@@ -180,6 +275,346 @@ def test_make_repo_starting_at_version(in_git_dir, fake_versions):
     ]
 
 
+@pytest.mark.parametrize(
+    ('previous_version', 'mirrored', 'expected'),
+    (
+        # first run
+        (None, set(), ['1.0', '1.1', '2.0']),
+        # nothing new
+        ('2.0', {'1.0', '1.1', '2.0'}, []),
+        ('1.0', {'1.0'}, ['1.1', '2.0']),
+        # tags without a .version
+        (None, {'1.0'}, ['1.1', '2.0']),
+        # .version without tags
+        ('1.1', set(), ['2.0']),
+        # an already tagged version is not applied again
+        ('1.0', {'1.0', '2.0'}, ['1.1']),
+        # tags which are not upstream versions are ignored
+        (None, {'latest'}, ['1.0', '1.1', '2.0']),
+        # .version was yanked, resume after the last mirrored version
+        ('1.2', {'1.0', '1.1', '1.2'}, ['2.0']),
+        # nothing mirrored is listed anymore, resume by version order
+        ('1.2', {'1.2'}, ['2.0']),
+    ),
+)
+def test_versions_to_apply_after(previous_version, mirrored, expected):
+    ret = versions_to_apply_after(
+        ('1.0', '1.1', '2.0'),
+        previous_version=previous_version,
+        mirrored=mirrored,
+    )
+    assert ret == expected
+
+
+def test_versions_to_apply_after_unorderable():
+    with pytest.raises(ValueError) as excinfo:
+        versions_to_apply_after(
+            ('1.0', 'nope'), previous_version='0.5', mirrored=set(),
+        )
+    msg, = excinfo.value.args
+    assert msg == (
+        '.version 0.5 is no longer listed upstream and cannot be ordered '
+        'against upstream versions'
+    )
+
+
+def test_make_repo_previous_version_deleted_upstream(in_git_dir):
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0',
+    }
+    make_repo('.', package_versions=['0.23.1', '0.24.0'], **kwargs)
+    # 0.24.0 was yanked and a new version released
+    make_repo('.', package_versions=['0.23.1', '0.24.1'], **kwargs)
+
+    assert in_git_dir.join('.version').read().strip() == '0.24.1'
+    expected = ['v0.23.1', 'v0.24.0', 'v0.24.1']
+    assert _cmd('git', 'tag', '-l').split() == expected
+
+
+def test_make_repo_version_filter(in_git_dir):
+    versions = ['0.23.1', '0.24.0rc1', '0.24.0', '0.25.0', '1.0.0']
+    list_versions = mock.Mock(return_value=versions)
+    version_filter = VersionFilter.compile(
+        specifier='<1', stable=True, skip_yanked=True, latest=2,
+    )
+    with mock.patch.dict(LIST_VERSIONS, {'ruby': list_versions}):
+        make_repo(
+            '.',
+            language='ruby', name='scss-lint', description='',
+            entry='scss-lint', id='scss-lint', match_key='files',
+            match_val=r'\.scss$', args='[]', require_serial='false',
+            minimum_pre_commit_version='0',
+            version_filter=version_filter,
+        )
+    list_versions.assert_called_once_with('scss-lint', yanked=False)
+    assert _cmd('git', 'tag', '-l').split() == ['v0.24.0', 'v0.25.0']
+
+
+def test_make_repo_timings(in_git_dir, fake_versions):
+    timings: dict[str, float] = {}
+    make_repo(
+        '.',
+        language='ruby', name='scss-lint', description='', entry='scss-lint',
+        id='scss-lint', match_key='files', match_val=r'\.scss$', args='[]',
+        require_serial='false', minimum_pre_commit_version='0',
+        timings=timings,
+    )
+    assert set(timings) == {
+        'list', 'filter', 'plan', 'render',
+        'git update-index', 'git commit', 'git tag',
+    }
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_make_repo_saved(in_git_dir, fake_versions, bulk):
+    saved: dict[str, int] = {}
+    make_repo(
+        '.',
+        language='ruby', name='scss-lint', description='', entry='scss-lint',
+        id='scss-lint', match_key='files', match_val=r'\.scss$', args='[]',
+        require_serial='false', minimum_pre_commit_version='0',
+        bulk=bulk, saved=saved,
+    )
+    # LICENSE and .pre-commit-hooks.yaml only for the first of 3 versions
+    assert saved == {'writes': 4, 'hashes': 4}
+    for tag in ('v0.23.1', 'v0.24.0', 'v0.24.1'):
+        files = _cmd('git', 'ls-tree', '--name-only', tag).splitlines()
+        assert 'LICENSE' in files
+        assert '.pre-commit-hooks.yaml' in files
+
+
+def test_make_repo_bulk_timings(in_git_dir, fake_versions):
+    timings: dict[str, float] = {}
+    make_repo(
+        '.',
+        language='ruby', name='scss-lint', description='', entry='scss-lint',
+        id='scss-lint', match_key='files', match_val=r'\.scss$', args='[]',
+        require_serial='false', minimum_pre_commit_version='0',
+        bulk=True, timings=timings,
+    )
+    assert {'git fast-import', 'git read-tree'} < set(timings)
+
+
+def test_plan_repo(in_git_dir, fake_versions):
+    in_git_dir.join('.version').write('0.23.1')
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0',
+    }
+    timings: dict[str, float] = {}
+    saved: dict[str, int] = {}
+    plan = plan_repo('.', timings=timings, saved=saved, **kwargs)
+
+    # nothing was committed
+    assert _cmd('git', 'tag', '-l') == ''
+    assert set(timings) == {'list', 'filter', 'plan', 'render'}
+    assert saved == {'hashes': 2}
+
+    assert plan == {
+        'repo': '.',
+        'language': 'ruby',
+        'name': 'scss-lint',
+        'previous_version': '0.23.1',
+        'versions': [
+            {
+                'version': '0.24.0',
+                'additional_dependencies': [],
+                'files': {
+                    '.pre-commit-hooks.yaml': mock.ANY,
+                    '.version': mock.ANY,
+                    'LICENSE': mock.ANY,
+                    'pre_commit_fake_gem.gemspec': mock.ANY,
+                },
+            },
+            {
+                'version': '0.24.1',
+                'additional_dependencies': [],
+                'files': mock.ANY,
+            },
+        ],
+    }
+
+    # the hashes are what git stores
+    make_repo('.', **kwargs)
+    for planned in plan['versions']:
+        for filename, blob in planned['files'].items():
+            rev = f'v{planned["version"]}:{filename}'
+            assert _cmd('git', 'rev-parse', rev) == blob
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_make_repo_leaves_other_files_alone(in_git_dir, fake_versions, bulk):
+    in_git_dir.join('README.md').write('hello\n')
+    in_git_dir.join('hooks.yaml').write('[]\n')
+    _cmd('git', 'add', '.')
+    _cmd('git', 'commit', '-m', 'initial')
+    in_git_dir.join('README.md').write('hello world\n')
+    in_git_dir.join('notes.txt').write('scratch\n')
+
+    make_repo(
+        '.',
+        language='ruby', name='scss-lint', description='', entry='scss-lint',
+        id='scss-lint', match_key='files', match_val=r'\.scss$', args='[]',
+        require_serial='false', minimum_pre_commit_version='0',
+        bulk=bulk,
+    )
+
+    assert _cmd('git', 'diff', '--cached', '--name-only') == ''
+    assert _cmd('git', 'diff', '--name-only') == 'README.md'
+    assert _cmd('git', 'ls-files', '--others') == 'notes.txt'
+    assert in_git_dir.join('README.md').read() == 'hello world\n'
+    files = _cmd('git', 'ls-tree', '--name-only', 'v0.24.1').splitlines()
+    assert 'hooks.yaml' not in files
+    assert 'notes.txt' not in files
+
+
+def test_make_repo_does_not_rewrite_unchanged_files(in_git_dir):
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0',
+    }
+    make_repo('.', package_versions=['0.23.1'], **kwargs)
+
+    with mock.patch('builtins.open', wraps=open) as mck:
+        make_repo('.', package_versions=['0.23.1', '0.24.0'], **kwargs)
+
+    written = {
+        os.path.basename(call.args[0])
+        for call in mck.call_args_list
+        if call.args[1:] == ('w',)
+    }
+    assert '.version' in written
+    assert 'LICENSE' not in written
+    assert _cmd('git', 'status', '--short') == ''
+    assert _cmd('git', 'show', 'v0.24.0:.version') == '0.24.0'
+
+
+def _history():
+    trees = _cmd('git', 'log', '--format=%T %s')
+    tags = _cmd('git', 'for-each-ref', '--format=%(refname) %(tree)')
+    return trees, tags
+
+
+@pytest.mark.parametrize('version_file', (None, '0.23.1'))
+def test_make_repo_bulk_matches_loop(tmpdir, fake_versions, version_file):
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0',
+    }
+
+    histories = []
+    for bulk in (False, True):
+        path = tmpdir.join(f'bulk-{bulk}')
+        subprocess.check_call(('git', 'init', '-q', path))
+        with path.as_cwd():
+            path.join('README.md').write('hello\n')
+            path.join('hooks.yaml').ensure()
+            if version_file is not None:
+                path.join('.version').write(version_file)
+            make_repo('.', bulk=bulk, **kwargs)
+
+            assert not path.join('hooks.yaml').exists()
+            assert path.join('.version').read().strip() == '0.24.1'
+            # only our files are committed
+            assert _cmd('git', 'status', '--short') == '?? README.md'
+            histories.append(_history())
+
+    loop, bulk = histories
+    assert bulk == loop
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_make_repo_checkpoint_resumes(tmpdir, bulk):
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0', 'bulk': bulk, 'checkpoint': 2,
+    }
+    versions = ('1.0', '1.1', '1.2', '1.3', '1.4')
+    fns = {'ruby': lambda _, *, yanked: versions}
+
+    expected_path = tmpdir.join('expected')
+    subprocess.check_call(('git', 'init', '-q', expected_path))
+    with expected_path.as_cwd(), mock.patch.dict(LIST_VERSIONS, fns):
+        make_repo('.', **kwargs)
+        expected = _history()
+
+    path = tmpdir.join('interrupted')
+    subprocess.check_call(('git', 'init', '-q', path))
+    with path.as_cwd():
+        write = journal.write
+
+        def interrupt(filename, entry):
+            write(filename, entry)
+            if entry['committed'] >= 2:
+                raise Interrupted
+
+        with (
+                mock.patch.dict(LIST_VERSIONS, fns),
+                mock.patch.object(journal, 'write', interrupt),
+                pytest.raises(Interrupted),
+        ):
+            make_repo('.', **kwargs)
+        assert os.path.exists(journal.path('.'))
+        tags = _cmd('git', 'tag', '-l').split()
+        assert 2 <= len(tags) < len(versions)
+
+        # as if interrupted between the commit and its tag, part way into
+        # the next version
+        _cmd('git', 'tag', '-d', tags[-1])
+        path.join('.version').write('1.9\n')
+        _cmd('git', 'add', '.version')
+        path.join('notes.txt').write('scratch\n')
+
+        # resumes from the journal rather than listing again
+        not_listed = {'ruby': mock.Mock(side_effect=AssertionError)}
+        with mock.patch.dict(LIST_VERSIONS, not_listed):
+            make_repo('.', **kwargs)
+
+        assert not os.path.exists(journal.path('.'))
+        assert _history() == expected
+        assert _cmd('git', 'status', '--short') == '?? notes.txt'
+
+
+def test_make_repo_checkpoint_stale_journal(in_git_dir, fake_versions):
+    kwargs: dict[str, Any] = {
+        'language': 'ruby', 'name': 'scss-lint', 'description': '',
+        'entry': 'scss-lint', 'id': 'scss-lint', 'match_key': 'files',
+        'match_val': r'\.scss$', 'args': '[]', 'require_serial': 'false',
+        'minimum_pre_commit_version': '0', 'checkpoint': 1,
+    }
+    make_repo('.', package_versions=['0.23.1'], **kwargs)
+    # everything it planned was committed already
+    journal.write(
+        journal.path('.'),
+        {
+            'language': 'ruby', 'name': 'scss-lint',
+            'versions': ['0.23.1'], 'committed': 0,
+        },
+    )
+
+    make_repo('.', **kwargs)
+
+    assert _cmd('git', 'tag', '-l').split() == [
+        'v0.23.1', 'v0.24.0', 'v0.24.1',
+    ]
+    assert not os.path.exists(journal.path('.'))
+
+
 def test_ruby_integration(in_git_dir):
     make_repo(
         '.',
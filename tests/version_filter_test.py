@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pytest
+
+from pre_commit_mirror_maker.version_filter import VersionFilter
+
+VERSIONS = (
+    '0.9.0', '1.0.0a1', '1.0.0', '1.0.1.dev0', '1.0.1', '1.1.0rc1',
+    '1.1.0', '2.0.0-next.1', '2.0.0', '2.0.0.post1',
+)
+
+
+def test_default_keeps_everything():
+    assert VersionFilter()(VERSIONS) == list(VERSIONS)
+
+
+@pytest.mark.parametrize(
+    ('kwargs', 'expected'),
+    (
+        (
+            {'stable': True},
+            ['0.9.0', '1.0.0', '1.0.1', '1.1.0', '2.0.0', '2.0.0.post1'],
+        ),
+        (
+            {'specifier': '>=1,<2'},
+            ['1.0.0', '1.0.1.dev0', '1.0.1', '1.1.0rc1', '1.1.0'],
+        ),
+        (
+            {'specifier': '>=1,<2,!=1.0.1', 'stable': True},
+            ['1.0.0', '1.1.0'],
+        ),
+        ({'latest': 2}, ['2.0.0', '2.0.0.post1']),
+        ({'latest': 100}, list(VERSIONS)),
+        # the window applies to what is left
+        ({'stable': True, 'latest': 3}, ['1.1.0', '2.0.0', '2.0.0.post1']),
+        ({'specifier': '~=1.0.0', 'latest': 1}, ['1.0.1']),
+    ),
+)
+def test_filter(kwargs, expected):
+    assert VersionFilter.compile(**kwargs)(VERSIONS) == expected
+
+
+def test_keeps_upstream_order():
+    versions = ['2.0.0', '1.0.0', '3.0.0']
+    assert VersionFilter.compile(stable=True)(versions) == versions
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    ({'specifier': '>=1,lol'}, {'latest': 0}),
+)
+def test_compile_invalid(kwargs):
+    with pytest.raises(ValueError):
+        VersionFilter.compile(**kwargs)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from packaging import version
+
+from pre_commit_mirror_maker.version_order import sort_versions
+
+
+def test_sort_versions_first_run():
+    ret = sort_versions('python', 'pkg', ['1.10', '1.9', '1.0rc1', '1.0'])
+    assert ret == ['1.0rc1', '1.0', '1.9', '1.10']
+
+
+def test_sort_versions_only_parses_new_versions():
+    versions = [f'1.{i}' for i in range(100)]
+    sort_versions('python', 'pkg', versions)
+
+    with mock.patch.object(version, 'parse', wraps=version.parse) as mck:
+        assert sort_versions('python', 'pkg', versions) == versions
+    assert mck.call_count == 0
+
+    with mock.patch.object(version, 'parse', wraps=version.parse) as mck:
+        ret = sort_versions('python', 'pkg', ['1.100', '1.50.1', *versions])
+    assert ret == [*versions[:51], '1.50.1', *versions[51:], '1.100']
+    # a binary search per new version rather than a full sort
+    assert 0 < mck.call_count < 30
+
+
+def test_sort_versions_removed_upstream():
+    sort_versions('python', 'pkg', ['1.0', '1.1', '1.2'])
+    assert sort_versions('python', 'pkg', ['1.2', '1.0']) == ['1.0', '1.2']
+    assert sort_versions('python', 'pkg', ['1.3', '1.0']) == ['1.0', '1.3']
+
+
+def test_sort_versions_keyed_by_package():
+    sort_versions('python', 'pkg', ['1.0', '2.0'])
+    assert sort_versions('golang', 'pkg', ['3.0']) == ['3.0']
+    assert sort_versions('python', 'other', ['0.1']) == ['0.1']